@@ -1,14 +1,32 @@
 #!/usr/bin/env python3
 """
 Railway-compatible version of the Grade 12 Results Bot
-This version includes a simple web server for health checks
+This version includes a web server for health checks and result lookups.
+Set WEB_WORKERS to run several pre-forked web workers on one port
 """
 
 import os
+import hmac
+import json
+import time
+import signal
+import socket
 import asyncio
 import logging
 import threading
-from telegram_bot import Grade12ResultBot
+import multiprocessing
+from typing import Optional, List, Tuple
+from aiohttp import web
+from telegram_bot import Grade12ResultBot, DRAIN_TIMEOUT
+from lanes import get_lookup_lanes
+from result_cache import get_result_cache, cache_key, SHARED_CACHE_PATH
+from warm_state import save_snapshot, load_snapshot
+from upstream import get_upstream_pool
+from profiling import sample_profile, watch_loop, profile_in_background
+from event_log import get_event_log, close_event_log
+from messages import result_total
+from warmup import start_warmup, read_progress, set_paused
+from http_cache import StaticAsset, load_assets, conditional_json, PAGE_MAX_AGE
 
 # Enable logging
 logging.basicConfig(
@@ -17,58 +35,507 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def health_check():
-    """Simple health check for Railway"""
-    from aiohttp import web
-    
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+
+# Protects the /debug endpoints, which are disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# Length of the profile SIGUSR1 takes of the pre-fork master
+PROFILE_SECONDS = float(os.environ.get('PROFILE_SECONDS', 30))
+
+# Seconds between worker heartbeats, and how stale one may get before the worker is replaced
+HEARTBEAT_INTERVAL = 2
+RESPAWN_BACKOFF = 1
+MAX_RESPAWN_BACKOFF = 60
+HEARTBEAT_TIMEOUT = int(os.environ.get('WEB_WORKER_TIMEOUT', 30))
+
+def web_worker_count() -> int:
+    """Number of web workers from WEB_WORKERS ('auto' means one per CPU)"""
+    value = os.environ.get('WEB_WORKERS', '1').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning(f"Invalid WEB_WORKERS value {value!r}, using 1")
+        return 1
+
+class WebState:
+    def __init__(self):
+        # Set on shutdown: new upstream lookups are refused while in-flight ones finish
+        self.draining = False
+        self.in_flight = 0
+
+def json_response(body: str, status: int = 200) -> web.Response:
+    """Return already-serialized JSON, never cached"""
+    return web.Response(text=body, status=status, content_type='application/json',
+                        headers={'Cache-Control': 'no-store'})
+
+async def check_results(request: web.Request) -> web.Response:
+    """Look up a student's results for the web front end"""
+    try:
+        payload = await request.json()
+    except ValueError:
+        return json_response('{"success":false,"error":"❌ Invalid request."}', status=400)
+
+    if not isinstance(payload, dict):
+        return json_response('{"success":false,"error":"❌ Invalid request."}', status=400)
+
+    admission_no = str(payload.get('admissionNo', '')).strip()
+    first_name = str(payload.get('firstName', '')).strip()
+    if not admission_no or not first_name:
+        return json_response(
+            '{"success":false,"error":"❌ Please enter your admission number and first name."}',
+            status=400
+        )
+
+    started = time.monotonic()
+    cache = request.app['result_cache']
+    key = cache_key(admission_no, first_name)
+    body = cache.get_json(key)
+
+    lanes = request.app['lanes']
+    if body is not None:
+        lanes.fast.observe(time.monotonic() - started)
+        record_web_lookup(request.app, admission_no, {'status': 'found', 'cache_hit': True}, started)
+    else:
+        if request.app['state'].draining:
+            record_web_lookup(request.app, admission_no, {'status': 'draining'}, started)
+            response = json_response(
+                '{"success":false,"error":"🔄 The server is restarting. Please try again in a minute."}',
+                status=503
+            )
+            response.headers['Retry-After'] = '30'
+            return response
+
+        request.app['state'].in_flight += 1
+        trace = {}
+        try:
+            # Misses queue for the upstream lane's own workers, never the loop's default executor
+            data = await lanes.fetch(admission_no, first_name, trace)
+        finally:
+            request.app['state'].in_flight -= 1
+        record_web_lookup(request.app, admission_no, trace, started, data)
+        if not data:
+            return json_response(
+                '{"success":false,"error":"❌ Could not find your results. Please check your details and try again."}',
+                status=404
+            )
+        body = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+    return conditional_json(request, '{"success":true,"data":' + body + '}')
+
+def record_web_lookup(app: web.Application, admission_no: str, trace: dict, started: float,
+                      data: Optional[dict] = None) -> None:
+    """Append a web lookup outcome to the event log"""
+    event_log = app['event_log']
+    if event_log is None:
+        return
+    # Scores come from upstream fetches only, so each student counts once in pass rates
+    total = result_total(data.get('results', [])) if data and not trace.get('cache_hit') else None
+    event_log.record(
+        admission_no,
+        trace.get('status', 'error'),
+        time.monotonic() - started,
+        cache_hit=trace.get('cache_hit', False),
+        retries=trace.get('retries', 0),
+        total=total,
+        source='web'
+    )
+
+async def drain_web(runner: web.AppRunner, timeout: float = DRAIN_TIMEOUT) -> None:
+    """Stop accepting connections, refuse new upstream lookups and wait for in-flight ones to finish"""
+    # Close the listener first so SO_REUSEPORT sends new connections to the other workers
+    for site in list(runner.sites):
+        await site.stop()
+    state = runner.app['state']
+    state.draining = True
+    logger.info(f"Draining {state.in_flight} in-flight web lookups...")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while state.in_flight and loop.time() < deadline:
+        await asyncio.sleep(0.1)
+    if state.in_flight:
+        logger.warning(f"Drain deadline reached with {state.in_flight} web lookups still running")
+
+def is_admin(request: web.Request) -> bool:
+    """Check the admin token from the X-Admin-Token header, never the URL, which ends up in access logs"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+async def debug_profile(request: web.Request) -> web.Response:
+    """Sample this process for ?seconds=N and return collapsed stacks for a flamegraph"""
+    # With WEB_WORKERS > 1 this profiles a web worker only; the bot runs in the master,
+    # which serves no HTTP and is profiled with SIGUSR1 instead (see run_prefork)
+    if not is_admin(request):
+        return web.Response(text="Forbidden", status=403)
+
+    try:
+        seconds = float(request.query.get('seconds', 10))
+    except ValueError:
+        return web.Response(text="seconds must be a number", status=400)
+
+    loop = asyncio.get_running_loop()
+    try:
+        stacks = await loop.run_in_executor(None, sample_profile, seconds)
+    except RuntimeError as e:
+        return web.Response(text=str(e), status=409)
+
+    return web.Response(text=stacks, headers={'X-Profiled-Pid': str(os.getpid())})
+
+async def warmup_control(request: web.Request) -> web.Response:
+    """Show warm-up progress, or pause and resume it with POST ?action=pause|resume"""
+    if not is_admin(request):
+        return web.Response(text="Forbidden", status=403)
+
+    if request.method == 'POST':
+        action = request.query.get('action')
+        if action not in ('pause', 'resume'):
+            return web.Response(text="action must be pause or resume", status=400)
+        set_paused(action == 'pause')
+
+    return web.json_response(read_progress() or {'state': 'none'})
+
+def create_web_app() -> web.Application:
+    """Build the aiohttp application"""
     async def handler(request):
+        if request.app['state'].draining:
+            return web.Response(text="Grade 12 Results Bot is restarting", status=503)
         return web.Response(text="Grade 12 Results Bot is running! 🎓", status=200)
-    
+
+    async def upstream_stats(request):
+        return web.json_response({'pid': os.getpid(), 'endpoints': get_upstream_pool().stats()})
+
+    async def lane_stats(request):
+        return web.json_response({'pid': os.getpid(), 'lanes': request.app['lanes'].stats()})
+
+    async def results_page(request):
+        return request.app['page'].response(request)
+
+    async def static_asset(request):
+        asset = request.app['assets'].get(request.match_info['name'])
+        if asset is None:
+            raise web.HTTPNotFound()
+        return asset.response(request)
+
     app = web.Application()
+    app['result_cache'] = get_result_cache()
+    app['state'] = WebState()
+    app['event_log'] = get_event_log()
+    app['lanes'] = get_lookup_lanes()
+    # Compressed once here rather than on every request
+    app['page'] = StaticAsset(TEMPLATE_PATH, PAGE_MAX_AGE, 'text/html')
+    app['assets'] = load_assets(ASSETS_DIR)
     app.router.add_get('/', handler)
     app.router.add_get('/health', handler)
-    
+    app.router.add_get('/results', results_page)
+    app.router.add_get('/assets/{name}', static_asset)
+    app.router.add_post('/check_results', check_results)
+    app.router.add_get('/upstreams', upstream_stats)
+    app.router.add_get('/lanes', lane_stats)
+    app.router.add_get('/debug/profile', debug_profile)
+    app.router.add_get('/warmup', warmup_control)
+    app.router.add_post('/warmup', warmup_control)
+    return app
+
+async def health_check(reuse_port: bool = False):
+    """Simple health check for Railway"""
+    app = create_web_app()
+
     runner = web.AppRunner(app)
     await runner.setup()
-    
+
     # Use Railway's PORT environment variable or default to 8080
     port = int(os.environ.get('PORT', 8080))
-    site = web.TCPSite(runner, '0.0.0.0', port)
+    site = web.TCPSite(runner, '0.0.0.0', port, reuse_port=reuse_port or None)
     await site.start()
-    
+
     logger.info(f"Health check server started on port {port}")
     return runner
 
-def run_bot():
-    """Run the Telegram bot in a separate thread"""
+async def serve_worker(index: int, heartbeat) -> None:
+    """Serve HTTP in a pre-forked worker until SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    runner = await health_check(reuse_port=True)
+    watch_loop(f"web-worker-{index}")
+    logger.info(f"Web worker {index} ready (pid {os.getpid()})")
+
+    while not stop.is_set():
+        heartbeat.value = time.time()
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+    logger.info(f"Web worker {index} shutting down")
+    await drain_web(runner)
+    await runner.cleanup()
+    close_event_log()
+
+def run_web_worker(index: int, heartbeat) -> None:
+    """Entry point of a pre-forked web worker process"""
+    asyncio.run(serve_worker(index, heartbeat))
+
+class WebWorker:
+    def __init__(self, index: int, process, heartbeat):
+        self.index = index
+        self.process = process
+        self.heartbeat = heartbeat
+        self.started_at = time.time()
+
+class WorkerSupervisor:
+    def __init__(self, workers: int, heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+                 stop_timeout: float = DRAIN_TIMEOUT + 5):
+        self.size = workers
+        self.heartbeat_timeout = heartbeat_timeout
+        self.stop_timeout = stop_timeout
+        # Spawn rather than fork: the master runs the bot thread
+        self.ctx = multiprocessing.get_context('spawn')
+        self.workers: List[Optional[WebWorker]] = [None] * workers
+        self.restarts = 0
+        # Workers that crash before becoming ready are respawned with exponential backoff
+        self.crashes = [0] * workers
+        self.respawn_at = [0.0] * workers
+        # Replaced workers still draining, with the time they get killed if they have not exited
+        self.retiring: List[Tuple[WebWorker, float]] = []
+
+    def start(self) -> None:
+        """Start every worker"""
+        for index in range(self.size):
+            self.workers[index] = self.spawn(index)
+
+    def spawn(self, index: int) -> WebWorker:
+        """Start one worker process"""
+        heartbeat = self.ctx.Value('d', 0.0, lock=False)
+        process = self.ctx.Process(
+            target=run_web_worker,
+            args=(index, heartbeat),
+            name=f"web-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return WebWorker(index, process, heartbeat)
+
+    def check(self) -> None:
+        """Replace workers that died or stopped sending heartbeats"""
+        now = time.time()
+        self.reap(now)
+        for index, worker in enumerate(self.workers):
+            if worker is None:
+                if self.respawn_at[index] and now >= self.respawn_at[index]:
+                    self.respawn_at[index] = 0.0
+                    self.workers[index] = self.spawn(index)
+                continue
+            if not worker.process.is_alive():
+                logger.warning(f"Web worker {index} exited with code {worker.process.exitcode}, restarting")
+            elif worker.heartbeat.value:
+                self.crashes[index] = 0
+                if now - worker.heartbeat.value <= self.heartbeat_timeout:
+                    continue
+                logger.warning(f"Web worker {index} missed heartbeats, restarting")
+            elif now - worker.started_at > self.heartbeat_timeout:
+                logger.warning(f"Web worker {index} did not become ready, restarting")
+            else:
+                continue
+            self.retire(worker, now)
+            self.restarts += 1
+
+            if worker.heartbeat.value:
+                self.workers[index] = self.spawn(index)
+                continue
+            # It never became ready, so a respawn right away would most likely fail the same way
+            self.crashes[index] += 1
+            delay = min(RESPAWN_BACKOFF * 2 ** (self.crashes[index] - 1), MAX_RESPAWN_BACKOFF)
+            logger.warning(f"Web worker {index} failed {self.crashes[index]} times in a row, retrying in {delay:.0f}s")
+            self.workers[index] = None
+            self.respawn_at[index] = now + delay
+
+    def rolling_restart(self) -> None:
+        """Replace workers one at a time, starting each replacement before stopping the old one"""
+        logger.info("Rolling restart of web workers...")
+        for index, old in enumerate(self.workers):
+            new = self.spawn(index)
+            deadline = time.time() + self.heartbeat_timeout
+            while not new.heartbeat.value and new.process.is_alive() and time.time() < deadline:
+                time.sleep(0.1)
+            if not new.heartbeat.value:
+                logger.error(f"Replacement for web worker {index} did not become ready, keeping the old one")
+                self.stop_worker(new)
+                continue
+            self.workers[index] = new
+            if old is not None:
+                self.stop_worker(old)
+        logger.info("Rolling restart complete")
+
+    def retire(self, worker: WebWorker, now: float) -> None:
+        """Ask a worker to finish in-flight requests without waiting for it
+
+        A worker missing heartbeats usually has a blocked loop and ignores SIGTERM, so
+        check() must not stall on it; later passes reap it or kill it at its deadline.
+        """
+        if worker.process.is_alive():
+            worker.process.terminate()
+        self.retiring.append((worker, now + self.stop_timeout))
+
+    def reap(self, now: float) -> None:
+        """Collect retired workers that exited, and kill those past their deadline"""
+        retiring = []
+        for worker, kill_at in self.retiring:
+            if worker.process.is_alive() and now >= kill_at:
+                logger.warning(f"Web worker {worker.index} did not exit, killing")
+                worker.process.kill()
+            if worker.process.is_alive():
+                retiring.append((worker, kill_at))
+            else:
+                worker.process.join()
+        self.retiring = retiring
+
+    def stop_worker(self, worker: WebWorker, timeout: Optional[float] = None) -> None:
+        """Ask a worker to finish in-flight requests, then kill it if it does not exit"""
+        if worker.process.is_alive():
+            worker.process.terminate()
+        worker.process.join(self.stop_timeout if timeout is None else timeout)
+        if worker.process.is_alive():
+            logger.warning(f"Web worker {worker.index} did not exit, killing")
+            worker.process.kill()
+            worker.process.join()
+
+    def stop(self) -> None:
+        """Stop every worker, including ones still retiring"""
+        workers = [worker for worker in self.workers if worker is not None]
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for worker in workers:
+            self.stop_worker(worker)
+        for worker, kill_at in self.retiring:
+            self.stop_worker(worker, max(0.0, kill_at - time.time()))
+        self.retiring = []
+
+def create_bot() -> Optional[Grade12ResultBot]:
+    """Create the Telegram bot if a token is configured"""
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-    
+
     if not bot_token:
         logger.error("TELEGRAM_BOT_TOKEN environment variable not set!")
-        return
-    
+        return None
+
+    return Grade12ResultBot(bot_token)
+
+def run_bot(bot: Grade12ResultBot):
+    """Run the Telegram bot in a separate thread"""
     logger.info("Starting Telegram bot...")
-    bot = Grade12ResultBot(bot_token)
+    # Threads other than the main one have no event loop by default
+    asyncio.set_event_loop(asyncio.new_event_loop())
     bot.run()
 
+def start_bot_thread() -> tuple[Optional[Grade12ResultBot], Optional[threading.Thread]]:
+    """Start the bot in a background thread"""
+    bot = create_bot()
+    if bot is None:
+        return None, None
+    bot_thread = threading.Thread(target=run_bot, args=(bot,), daemon=True)
+    bot_thread.start()
+    return bot, bot_thread
+
+def stop_bot(bot: Optional[Grade12ResultBot], bot_thread: Optional[threading.Thread]) -> None:
+    """Let the bot drain and save its state, then wait for its thread"""
+    if bot is None:
+        return
+    bot.request_shutdown()
+    bot_thread.join(DRAIN_TIMEOUT + 5)
+    if bot_thread.is_alive():
+        logger.warning("Bot did not stop within the drain deadline")
+
+def run_prefork(workers: int) -> None:
+    """Run the web server as pre-forked workers sharing one port, with the bot in this process"""
+    logger.info(f"Starting Grade 12 Results Bot with {workers} web workers...")
+
+    # Workers share results through one cache file
+    if not os.environ.get('RESULT_CACHE_PATH'):
+        os.environ['RESULT_CACHE_PATH'] = SHARED_CACHE_PATH
+
+    supervisor = WorkerSupervisor(workers)
+    supervisor.start()
+
+    stopping = threading.Event()
+    restart_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGHUP, lambda signum, frame: restart_requested.set())
+    # The master serves no HTTP, so its bot is profiled to a file on SIGUSR1
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profile_in_background(PROFILE_SECONDS))
+
+    # Start bot in a separate thread, it restores and saves the warm state itself
+    bot, bot_thread = start_bot_thread()
+    if bot is None:
+        load_snapshot(get_result_cache())
+    warmup = start_warmup()
+
+    while not stopping.is_set():
+        if restart_requested.is_set():
+            restart_requested.clear()
+            supervisor.rolling_restart()
+        supervisor.check()
+        stopping.wait(1)
+
+    logger.info("Shutting down...")
+    if warmup:
+        warmup.stop()
+    # Workers and the bot drain in parallel
+    bot_stopper = threading.Thread(target=stop_bot, args=(bot, bot_thread))
+    bot_stopper.start()
+    supervisor.stop()
+    bot_stopper.join()
+    if bot is None:
+        save_snapshot(get_result_cache(), {})
+    close_event_log()
+
 async def main():
     """Main function to run both web server and bot"""
     logger.info("Starting Grade 12 Results Bot with health check...")
-    
+
     # Start health check server
     web_runner = await health_check()
-    
-    # Start bot in a separate thread
-    bot_thread = threading.Thread(target=run_bot, daemon=True)
-    bot_thread.start()
-    
-    try:
-        # Keep the web server running
-        while True:
-            await asyncio.sleep(1)
-    except KeyboardInterrupt:
-        logger.info("Shutting down...")
-        await web_runner.cleanup()
+    watch_loop("web")
+
+    # Start bot in a separate thread, it restores and saves the warm state itself
+    bot, bot_thread = start_bot_thread()
+    if bot is None:
+        load_snapshot(get_result_cache())
+    warmup = start_warmup()
+
+    # Keep the web server running until Railway (or Ctrl+C) asks us to stop
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    loop.add_signal_handler(signal.SIGINT, stop.set)
+    await stop.wait()
+
+    logger.info("Shutting down...")
+    if warmup:
+        warmup.stop()
+    await asyncio.gather(
+        drain_web(web_runner),
+        loop.run_in_executor(None, stop_bot, bot, bot_thread)
+    )
+    if bot is None:
+        save_snapshot(get_result_cache(), {})
+    await web_runner.cleanup()
+    close_event_log()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    workers = web_worker_count()
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        logger.warning("SO_REUSEPORT is not supported here, running a single web worker")
+        workers = 1
+
+    if workers > 1:
+        run_prefork(workers)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for rendering the result messages
+Compares the precompiled templates in messages.py with the per-call
+f-string and += building the bot used before, timing the text and the
+reply keyboard separately so one cannot hide the other
+"""
+
+import timeit
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import messages
+
+STUDENT = {
+    "FullName": "Abebe Kebede Tesfaye",
+    "Admission_No": "1234567890",
+    "Sex": "M",
+    "School": "Menelik II Preparatory School",
+    "Stream": "Natural Science",
+}
+RESULTS = [{"Subject": f"Subject {i}", "Result": str(60 + i)} for i in range(8)] + [{"Subject": "Total", "Result": "512"}]
+
+def legacy_text():
+    """The old send_results formatting"""
+    student_info = f"""
+👨‍🎓 *STUDENT INFORMATION*
+
+📝 **Name:** {STUDENT.get('FullName', 'N/A')}
+🎓 **Admission No:** {STUDENT.get('Admission_No', 'N/A')}
+👤 **Gender:** {STUDENT.get('Sex', 'N/A')}
+🏫 **School:** {STUDENT.get('School', 'N/A')}
+📚 **Stream:** {STUDENT.get('Stream', 'N/A')}
+        """
+    results_text = "📊 *SUBJECT RESULTS*\n\n"
+    for result in RESULTS:
+        results_text += f"📖 **{result.get('Subject', 'N/A')}:** {result.get('Result', 'N/A')}\n"
+    total_grade = RESULTS[-1].get('Result', 'N/A')
+    total = float(total_grade) if total_grade.replace('.', '').isdigit() else 0
+    results_text += f"\n🎯 **Total Result:** {total_grade}"
+    return student_info, results_text, total
+
+def legacy_keyboard():
+    """The results keyboard the old code rebuilt for every message"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔍 Check Another Result", callback_data="start_check")],
+        [InlineKeyboardButton("❓ Help", callback_data="help")]
+    ])
+
+def precompiled_text():
+    """The messages.py rendering, with Markdown escaping"""
+    return (
+        messages.render_student_info(STUDENT),
+        messages.render_results(RESULTS),
+        messages.result_total(RESULTS),
+    )
+
+def precompiled_keyboard():
+    """The keyboard built once at import"""
+    return messages.RESULTS_KEYBOARD
+
+def bench(func, number=20000):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    return best / number * 1e6
+
+def main():
+    """Run the benchmark"""
+    for title, legacy_func, precompiled_func in (
+        ("Text (student info + results)", legacy_text, precompiled_text),
+        ("Results keyboard", legacy_keyboard, precompiled_keyboard),
+    ):
+        legacy = bench(legacy_func)
+        precompiled = bench(precompiled_func)
+        print(f"📏 {title}, per message")
+        print(f"Legacy            : {legacy:6.2f} µs")
+        print(f"messages.py       : {precompiled:6.2f} µs")
+        print(f"Speedup           : {legacy / precompiled:6.2f}x")
+
+if __name__ == '__main__':
+    main()
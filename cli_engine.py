@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Asynchronous multi-student results checker
+Type one student per line while earlier lookups are still running; every
+lookup shares one connection pool and one rate limiter, and a status table
+shows each result as it arrives
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import threading
+from typing import Optional, Dict, Any, List
+import aiohttp
+from get_grade_12_result import build_request, display_results
+from upstream import get_upstream_pool, failure_reason, CONNECT_TIMEOUT, READ_TIMEOUT
+from result_cache import get_result_cache, cache_key
+from event_log import get_event_log, close_event_log
+from messages import result_total, PASS_MARK
+
+STATUS_ICONS = {
+    'queued': '⏳ queued',
+    'fetching': '🔍 fetching',
+    'waiting': '🔁 retrying',
+    'found': '✅ found',
+    'failed': '❌ failed',
+}
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: int = 1):
+        """Allow `rate` requests per second on average, with bursts of up to `burst`"""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for a token"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Lookup:
+    def __init__(self, number: int, admission_no: str, first_name: str):
+        self.number = number
+        self.admission_no = admission_no
+        self.first_name = first_name
+        self.status = 'queued'
+        self.attempts = 0
+        self.cache_hit = False
+        self.data: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.reason = 'error'  # event log status of the last failure
+        self.created = time.monotonic()
+        self.finished: Optional[float] = None
+
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.created
+
+    def summary(self) -> str:
+        if self.data is None:
+            return self.error or ''
+        total = result_total(self.data.get('results', []))
+        name = self.data.get('studentInfo', {}).get('FullName', self.first_name)
+        verdict = 'passed' if total > PASS_MARK else 'not passed'
+        return f"{name}: {total:g} ({verdict})"
+
+class CliEngine:
+    def __init__(self, concurrency: int = 4, rate: float = 2.0, max_retries: int = 5, live: Optional[bool] = None):
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate, burst=concurrency)
+        self.max_retries = max_retries
+        # Redraw a status table on terminals, print one line per event otherwise
+        self.live = sys.stdout.isatty() if live is None else live
+        self.pool = get_upstream_pool()
+        self.cache = get_result_cache()
+        self.event_log = get_event_log()
+        self.lookups: List[Lookup] = []
+        self.queue: "asyncio.Queue[Lookup]" = asyncio.Queue()
+        # Lookups in flight by cache key, so a student entered twice is only fetched once
+        self.pending: Dict[str, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def run(self, lines=None) -> None:
+        """Read students until EOF or 'done', then wait for every lookup to finish"""
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as self.session:
+            workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+            self.render()
+
+            if lines is None:
+                await self.read_stdin()
+            else:
+                for line in lines:
+                    self.handle_line(line)
+
+            await self.queue.join()
+            for worker in workers:
+                worker.cancel()
+
+        self.print_report()
+
+    async def read_stdin(self) -> None:
+        # A daemon thread rather than the default executor, which asyncio.run would wait
+        # on at exit, so Ctrl+C does not hang until the user types another line
+        loop = asyncio.get_running_loop()
+        lines: "asyncio.Queue[str]" = asyncio.Queue()
+
+        def reader():
+            while True:
+                line = sys.stdin.readline()
+                try:
+                    loop.call_soon_threadsafe(lines.put_nowait, line)
+                except RuntimeError:
+                    return  # the loop has closed
+                if not line:
+                    return
+
+        threading.Thread(target=reader, name="stdin", daemon=True).start()
+        while True:
+            line = await lines.get()
+            if not line or line.strip().lower() in ('done', 'quit', 'q'):
+                return
+            self.handle_line(line)
+
+    def handle_line(self, line: str) -> None:
+        """Queue '<admission number> <first name>', or run 'show <n>'"""
+        parts = line.split()
+        if not parts:
+            self.render()
+            return
+
+        if parts[0].lower() == 'show' and len(parts) == 2 and parts[1].isdigit():
+            number = int(parts[1])
+            if 1 <= number <= len(self.lookups) and self.lookups[number - 1].data:
+                display_results(self.lookups[number - 1].data)
+            else:
+                print(f"No results for #{number} yet.")
+            return
+
+        if len(parts) < 2:
+            print("Please enter: <admission number> <first name>")
+            return
+
+        lookup = Lookup(len(self.lookups) + 1, parts[0], ' '.join(parts[1:]))
+        self.lookups.append(lookup)
+        self.queue.put_nowait(lookup)
+        self.update(lookup)
+
+    async def worker(self) -> None:
+        while True:
+            lookup = await self.queue.get()
+            try:
+                await self.lookup(lookup)
+            except Exception as e:
+                lookup.status = 'failed'
+                lookup.error = f"Unexpected error: {e}"
+            finally:
+                lookup.finished = time.monotonic()
+                self.record(lookup)
+                self.update(lookup)
+                self.queue.task_done()
+
+    async def lookup(self, lookup: Lookup) -> None:
+        """Fetch one student's results, retrying with backoff"""
+        key = cache_key(lookup.admission_no, lookup.first_name)
+        cached = self.cache.get(key)
+        if cached is None and key in self.pending:
+            cached = await asyncio.shield(self.pending[key])
+        if cached is not None:
+            lookup.data, lookup.cache_hit, lookup.status = cached, True, 'found'
+            return
+
+        future = self.pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            await self.fetch_with_retry(lookup, key)
+        finally:
+            future.set_result(lookup.data)
+            del self.pending[key]
+
+    async def fetch_with_retry(self, lookup: Lookup, key: str) -> None:
+        for attempt in range(self.max_retries):
+            lookup.attempts = attempt + 1
+            if attempt > 0:
+                lookup.status = 'waiting'
+                self.update(lookup)
+                await asyncio.sleep(min(2 ** attempt + random.uniform(0, 1), 30))
+
+            await self.limiter.acquire()
+            lookup.status = 'fetching'
+            self.update(lookup)
+
+            data = await self.fetch(lookup)
+            if data is not None:
+                self.cache.put(key, data)
+                lookup.data, lookup.status = data, 'found'
+                return
+
+        lookup.status = 'failed'
+
+    async def fetch(self, lookup: Lookup) -> Optional[Dict[str, Any]]:
+        """One attempt against the healthiest upstream endpoint"""
+        payload, headers = build_request(lookup.admission_no, lookup.first_name)
+        endpoint = self.pool.select()
+        started = time.monotonic()
+        try:
+            async with self.session.post(endpoint.url, json=payload, headers=headers) as response:
+                self.pool.record_response(endpoint, response.status, time.monotonic() - started)
+                if response.status == 200:
+                    return await response.json(content_type=None)
+                status = response.status
+
+            lookup.reason = failure_reason(status)
+            lookup.error = f"{lookup.reason} (HTTP {status})"
+            # Back off harder when the server says it is overloaded
+            if status == 429:
+                await asyncio.sleep(10 + random.uniform(0, 5))
+            elif status == 503:
+                await asyncio.sleep(5 + random.uniform(0, 3))
+        except asyncio.TimeoutError:
+            self.pool.record_failure(endpoint, time.monotonic() - started, "timeout")
+            lookup.reason, lookup.error = 'timeout', "timeout"
+        except aiohttp.ClientError as e:
+            self.pool.record_failure(endpoint, time.monotonic() - started, "connection error")
+            lookup.reason, lookup.error = 'connection_error', f"connection error: {e}"
+        return None
+
+    def record(self, lookup: Lookup) -> None:
+        if self.event_log is None:
+            return
+        self.event_log.record(
+            lookup.admission_no,
+            'found' if lookup.status == 'found' else lookup.reason,
+            lookup.elapsed(),
+            cache_hit=lookup.cache_hit,
+            retries=max(0, lookup.attempts - 1),
+            total=result_total(lookup.data.get('results', [])) if lookup.data and not lookup.cache_hit else None,
+            source='cli'
+        )
+
+    def update(self, lookup: Lookup) -> None:
+        """Show a state change"""
+        if self.live:
+            self.render()
+        else:
+            detail = lookup.summary() if lookup.status in ('found', 'failed') else ''
+            attempt = f" (attempt {lookup.attempts})" if lookup.attempts > 1 else ''
+            print(f"[{lookup.number}] {lookup.admission_no} {lookup.first_name}: "
+                  f"{STATUS_ICONS[lookup.status]}{attempt} {detail}".rstrip(), flush=True)
+
+    def render(self) -> None:
+        """Redraw the status table and the prompt"""
+        if not self.live:
+            return
+        lines = [
+            "\033[H\033[2J" + "Ethiopian Grade 12 Results Checker - multi-student mode",
+            "=" * 78,
+            f"{'#':>3}  {'Admission':<14} {'First name':<14} {'Status':<16} {'Time':>6}  Result",
+        ]
+        for lookup in self.lookups:
+            attempt = f" x{lookup.attempts}" if lookup.attempts > 1 else ''
+            lines.append(
+                f"{lookup.number:>3}  {lookup.admission_no:<14.14} {lookup.first_name:<14.14} "
+                f"{STATUS_ICONS[lookup.status] + attempt:<16} {lookup.elapsed():5.1f}s  {lookup.summary()}"
+            )
+        lines.append("=" * 78)
+        lines.append("Enter '<admission number> <first name>', 'show <#>' for full results, or 'done' to finish.")
+        sys.stdout.write('\n'.join(lines) + "\n> ")
+        sys.stdout.flush()
+
+    def print_report(self) -> None:
+        """Print every retrieved result in full"""
+        for lookup in self.lookups:
+            if lookup.data:
+                print(f"\n#{lookup.number} - {lookup.admission_no} {lookup.first_name}")
+                display_results(lookup.data)
+        found = sum(1 for lookup in self.lookups if lookup.data)
+        print("\n" + "=" * 50)
+        print(f"Retrieved {found} of {len(self.lookups)} results.")
+
+def main():
+    """Run the multi-student checker"""
+    parser = argparse.ArgumentParser(description="Check several students' Grade 12 results at once")
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('CLI_CONCURRENCY', 4)),
+                        help="lookups running at the same time")
+    parser.add_argument('--rate', type=float, default=float(os.environ.get('CLI_RATE', 2)),
+                        help="maximum requests per second to the results server")
+    parser.add_argument('--retries', type=int, default=5, help="attempts per student")
+    parser.add_argument('--no-live', action='store_true', help="print one line per update instead of a table")
+    args = parser.parse_args([a for a in sys.argv[1:] if a != '--multi'])
+
+    engine_args = dict(concurrency=max(1, args.concurrency), rate=args.rate, max_retries=args.retries,
+                       live=False if args.no_live else None)
+    try:
+        asyncio.run(CliEngine(**engine_args).run())
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user.")
+    finally:
+        close_event_log()
+
+if __name__ == '__main__':
+    main()
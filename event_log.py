@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Lookup event log for the Grade 12 Results Bot
+Every lookup outcome is appended as a fixed-size binary record by a
+background thread (batched fsync, never on the event loop). Closed hourly
+segments are rolled up into columnar files that `python event_log.py stats`
+aggregates, vectorized with numpy (in requirements.txt; without it the
+same stats are computed in pure Python, only slower)
+"""
+
+import os
+import sys
+import time
+import glob
+import array
+import calendar
+import queue
+import struct
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Optional, Dict, Any, List
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', os.path.join(tempfile.gettempdir(), 'grade12_events'))
+# Admission numbers are hashed with this key so the log holds no student identifiers. Without
+# it a random key is generated once and kept in EVENT_LOG_DIR, shared by every process writing there
+EVENT_LOG_SALT = os.environ.get('EVENT_LOG_SALT', '').encode()
+SALT_FILE = 'salt'
+
+STATUSES = ('found', 'not_found', 'timeout', 'connection_error', 'rate_limited', 'server_error', 'error', 'draining')
+SOURCES = ('bot', 'web', 'cli')
+
+# timestamp, key hash, status, latency ms, cache hit, retries, total score (NaN if unknown), source
+RECORD = struct.Struct('<dQBfBBfB')
+# (name, array typecode) in record order; columnar files store the columns in this order
+COLUMNS = (
+    ('ts', 'd'),
+    ('key', 'Q'),
+    ('status', 'B'),
+    ('latency_ms', 'f'),
+    ('cache_hit', 'B'),
+    ('retries', 'B'),
+    ('total', 'f'),
+    ('source', 'B'),
+)
+ROLLUP_MAGIC = b'G12C'
+# The same layout as RECORD, so raw segments are parsed without a per-record Python loop
+RECORD_DTYPE = numpy.dtype([(name, numpy.dtype(code).newbyteorder('<')) for name, code in COLUMNS]) if numpy else None
+
+# A segment is only compacted this long after its hour ends, so late writes have landed
+COMPACT_GRACE = 60
+COMPACT_INTERVAL = 300
+
+def load_salt(directory: str = EVENT_LOG_DIR) -> bytes:
+    """The hashing key: EVENT_LOG_SALT, or the random one kept in the log directory, created on first use"""
+    if EVENT_LOG_SALT:
+        return EVENT_LOG_SALT
+    path = os.path.join(directory, SALT_FILE)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    # Link a complete file into place so concurrent workers all end up with the same key
+    fd, tmp_path = tempfile.mkstemp(prefix='.salt.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(32))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.unlink(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def hash_key(admission_no: str, salt: bytes) -> int:
+    """Keyed 64-bit hash of an admission number"""
+    digest = hashlib.blake2b(admission_no.strip().encode(), digest_size=8, key=salt).digest()
+    return int.from_bytes(digest, 'little')
+
+def hour_label(ts: float) -> str:
+    return time.strftime('%Y%m%d%H', time.gmtime(ts))
+
+class EventLog:
+    def __init__(self, directory: str = EVENT_LOG_DIR, fsync_interval: float = 1.0, batch_size: int = 512):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self.salt = load_salt(directory)
+        self._queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._writer, name='event-log', daemon=True)
+        self._thread.start()
+
+    def record(self, admission_no: str, status: str, latency: float, cache_hit: bool = False,
+               retries: int = 0, total: Optional[float] = None, source: str = 'bot') -> None:
+        """Queue one lookup outcome; never blocks on disk"""
+        try:
+            packed = RECORD.pack(
+                time.time(),
+                hash_key(admission_no, self.salt),
+                STATUSES.index(status),
+                latency * 1000,
+                1 if cache_hit else 0,
+                min(retries, 255),
+                float('nan') if total is None else float(total),
+                SOURCES.index(source),
+            )
+        except (ValueError, struct.error) as e:
+            self.dropped += 1
+            logger.warning(f"Dropping lookup event: {e}")
+            return
+        self._queue.put(packed)
+
+    def close(self, timeout: float = 5) -> None:
+        """Flush queued events and stop the writer"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _writer(self) -> None:
+        current_hour = None
+        segment = None
+        last_sync = last_compact = time.monotonic()
+        running = True
+
+        while running:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.fsync_interval)
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+                else:
+                    running = False
+            except queue.Empty:
+                pass
+
+            try:
+                hour = hour_label(time.time())
+                if hour != current_hour and segment is not None:
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                    segment.close()
+                    segment = None
+
+                if batch:
+                    if segment is None:
+                        current_hour = hour
+                        path = os.path.join(self.directory, f"events-{hour}-{os.getpid()}.bin")
+                        segment = open(path, 'ab')
+                    segment.write(b''.join(batch))
+
+                now = time.monotonic()
+                if segment is not None and (now - last_sync >= self.fsync_interval or not running):
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                    last_sync = now
+            except OSError as e:
+                self.dropped += len(batch)
+                logger.error(f"Could not write lookup events: {e}")
+
+            # Roll up hours that have closed
+            if time.monotonic() - last_compact >= COMPACT_INTERVAL:
+                last_compact = time.monotonic()
+                try:
+                    compact(self.directory)
+                except Exception as e:
+                    logger.error(f"Event log compaction failed: {e}")
+
+        if segment is not None:
+            segment.close()
+
+def read_segment(path: str) -> Dict[str, Any]:
+    """Read a raw segment into columns, ignoring a torn trailing record"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    data = data[:len(data) - len(data) % RECORD.size]
+    if numpy is not None:
+        records = numpy.frombuffer(data, dtype=RECORD_DTYPE)
+        return {name: numpy.ascontiguousarray(records[name]) for name, _ in COLUMNS}
+    columns = {name: array.array(code) for name, code in COLUMNS}
+    for record in RECORD.iter_unpack(data):
+        for (name, _), value in zip(COLUMNS, record):
+            columns[name].append(value)
+    return columns
+
+def write_rollup(path: str, columns: Dict[str, array.array]) -> None:
+    """Write columns to a columnar file: magic, row count, then each column's raw values"""
+    count = len(columns['ts'])
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(ROLLUP_MAGIC)
+        f.write(struct.pack('<I', count))
+        for name, code in COLUMNS:
+            column = columns[name]
+            if sys.byteorder != 'little':
+                column = array.array(code, column)
+                column.byteswap()
+            f.write(column.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_rollup(path: str) -> Dict[str, Any]:
+    """Read a columnar file as numpy arrays when available, otherwise as array.array"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != ROLLUP_MAGIC:
+        raise ValueError(f"{path} is not a rollup file")
+    count = struct.unpack_from('<I', data, 4)[0]
+
+    columns = {}
+    offset = 8
+    for name, code in COLUMNS:
+        size = array.array(code).itemsize * count
+        chunk = data[offset:offset + size]
+        if numpy is not None:
+            columns[name] = numpy.frombuffer(chunk, dtype=numpy.dtype(code).newbyteorder('<'))
+        else:
+            column = array.array(code)
+            column.frombytes(chunk)
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns[name] = column
+        offset += size
+    return columns
+
+def compact(directory: str = EVENT_LOG_DIR, now: Optional[float] = None) -> int:
+    """Roll closed hourly segments up into columnar files, returns the number of segments compacted"""
+    now = time.time() if now is None else now
+    compacted = 0
+    for path in sorted(glob.glob(os.path.join(directory, 'events-*.bin'))):
+        name = os.path.basename(path)
+        hour = name.split('-')[1]
+        hour_end = calendar.timegm(time.strptime(hour, '%Y%m%d%H')) + 3600
+        if hour_end + COMPACT_GRACE > now:
+            continue
+
+        # Claim the segment so concurrent compactors in other workers skip it
+        claimed = path + '.compacting'
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            continue
+
+        try:
+            columns = read_segment(claimed)
+            write_rollup(os.path.join(directory, name.replace('events-', 'rollup-').replace('.bin', '.col')), columns)
+            os.unlink(claimed)
+            compacted += 1
+        except OSError as e:
+            logger.error(f"Could not compact {name}: {e}")
+            os.rename(claimed, path)
+    return compacted
+
+def _concat(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if numpy is not None:
+        return {name: numpy.concatenate([p[name] for p in parts]) if parts else numpy.array([], dtype=code)
+                for name, code in COLUMNS}
+    merged = {name: array.array(code) for name, code in COLUMNS}
+    for part in parts:
+        for name, _ in COLUMNS:
+            merged[name].extend(part[name])
+    return merged
+
+def load_events(directory: str = EVENT_LOG_DIR, include_live: bool = True) -> Dict[str, Any]:
+    """Load every rolled-up event, plus the segments still being written when include_live is set"""
+    parts = [read_rollup(path) for path in sorted(glob.glob(os.path.join(directory, 'rollup-*.col')))]
+    if include_live:
+        for path in sorted(glob.glob(os.path.join(directory, 'events-*.bin'))):
+            parts.append(read_segment(path))
+    return _concat(parts)
+
+def hourly_stats(events: Dict[str, Any], pass_mark: float = 300) -> List[Dict[str, Any]]:
+    """Aggregate events per hour: volume, cache hit rate, failure reasons, latency and pass rate"""
+    if numpy is not None:
+        return _hourly_stats_numpy(events, pass_mark)
+
+    hours: Dict[int, Dict[str, Any]] = {}
+    for i in range(len(events['ts'])):
+        hour = int(events['ts'][i] // 3600)
+        bucket = hours.setdefault(hour, {'latencies': [], 'hits': 0, 'status': [0] * len(STATUSES), 'passed': 0, 'scored': 0})
+        bucket['latencies'].append(events['latency_ms'][i])
+        bucket['hits'] += events['cache_hit'][i]
+        bucket['status'][events['status'][i]] += 1
+        total = events['total'][i]
+        if total == total:  # not NaN
+            bucket['scored'] += 1
+            bucket['passed'] += total > pass_mark
+
+    rows = []
+    for hour in sorted(hours):
+        bucket = hours[hour]
+        latencies = sorted(bucket['latencies'])
+        count = len(latencies)
+        rows.append(_stats_row(
+            hour, count, bucket['hits'], bucket['status'], latencies[count // 2],
+            latencies[min(count - 1, int(count * 0.95))], bucket['passed'], bucket['scored']
+        ))
+    return rows
+
+def _hourly_stats_numpy(events: Dict[str, Any], pass_mark: float) -> List[Dict[str, Any]]:
+    if not len(events['ts']):
+        return []
+    # Dense hour index without a full sort: bucket by hour offset, then drop empty hours
+    hour = (events['ts'] // 3600).astype(numpy.int64)
+    first_hour = hour.min()
+    present = numpy.bincount(hour - first_hour) > 0
+    hours = numpy.nonzero(present)[0] + first_hour
+    index = (numpy.cumsum(present) - 1)[hour - first_hour]
+
+    counts = numpy.bincount(index)
+    hits = numpy.bincount(index, weights=events['cache_hit'])
+    status = numpy.bincount(
+        index * len(STATUSES) + events['status'], minlength=len(hours) * len(STATUSES)
+    ).reshape(len(hours), len(STATUSES))
+    scored_mask = ~numpy.isnan(events['total'])
+    scored = numpy.bincount(index, weights=scored_mask)
+    passed = numpy.bincount(index, weights=scored_mask & (numpy.nan_to_num(events['total']) > pass_mark))
+
+    # Group latencies by hour (a stable sort on small ints is a radix sort), then select percentiles per hour
+    order = numpy.argsort(index.astype(numpy.uint16) if len(hours) < 65536 else index, kind='stable')
+    grouped_latency = events['latency_ms'][order]
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+
+    rows = []
+    for i, hour in enumerate(hours):
+        count = int(counts[i])
+        ranks = [count // 2, min(count - 1, int(count * 0.95))]
+        latency = numpy.partition(grouped_latency[starts[i]:starts[i] + count], ranks)
+        rows.append(_stats_row(
+            int(hour), count, int(hits[i]), status[i].tolist(),
+            float(latency[ranks[0]]), float(latency[ranks[1]]),
+            int(passed[i]), int(scored[i])
+        ))
+    return rows
+
+def _stats_row(hour: int, count: int, hits: int, status: List[int], p50: float, p95: float,
+               passed: int, scored: int) -> Dict[str, Any]:
+    return {
+        'hour': time.strftime('%Y-%m-%d %H:00', time.gmtime(hour * 3600)),
+        'lookups': count,
+        'cache_hit_rate': hits / count,
+        'status': {name: int(n) for name, n in zip(STATUSES, status) if n},
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'pass_rate': passed / scored if scored else None,
+    }
+
+_event_log: Optional[EventLog] = None
+_event_log_lock = threading.Lock()
+
+def get_event_log() -> Optional[EventLog]:
+    """Return the process-wide event log, or None when EVENT_LOG_DIR is set to an empty value"""
+    global _event_log
+    if not EVENT_LOG_DIR:
+        return None
+    with _event_log_lock:
+        if _event_log is None:
+            try:
+                _event_log = EventLog(EVENT_LOG_DIR)
+            except OSError as e:
+                logger.error(f"Lookup event log disabled: {e}")
+                return None
+        return _event_log
+
+def close_event_log() -> None:
+    """Flush and stop the process-wide event log, if it was started"""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is not None:
+            _event_log.close()
+            _event_log = None
+
+def main():
+    """Command line: compact segments or print hourly stats"""
+    parser = argparse.ArgumentParser(description="Grade 12 Results Bot lookup analytics")
+    parser.add_argument('command', choices=['stats', 'compact'])
+    parser.add_argument('--dir', default=EVENT_LOG_DIR, help="event log directory")
+    parser.add_argument('--hours', type=int, default=0, help="only show the last N hours")
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        print(f"Compacted {compact(args.dir)} segments")
+        return
+
+    started = time.monotonic()
+    events = load_events(args.dir)
+    rows = hourly_stats(events)
+    if args.hours:
+        rows = rows[-args.hours:]
+
+    print(f"{'Hour':16}  {'Lookups':>8}  {'Hit %':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'Pass %':>6}  Outcomes")
+    for row in rows:
+        pass_rate = f"{row['pass_rate'] * 100:6.1f}" if row['pass_rate'] is not None else '     -'
+        outcomes = ', '.join(f"{name}={n}" for name, n in row['status'].items())
+        print(f"{row['hour']:16}  {row['lookups']:8}  {row['cache_hit_rate'] * 100:6.1f}  "
+              f"{row['p50_ms']:8.1f}  {row['p95_ms']:8.1f}  {pass_rate}  {outcomes}")
+    print(f"\n{len(events['ts']):,} events scanned in {time.monotonic() - started:.2f}s"
+          f"{'' if numpy is not None else ' (install numpy for faster stats)'}")
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,9 @@
+import sys
 import requests
 import time
 import random
-from typing import Optional
-
-# API endpoint
-url = "https://api.eaes.et/api/v1/results/web"
+from typing import Optional, Dict, Any, Callable
+from upstream import UpstreamPool, get_upstream_pool, failure_reason
 
 # User agents for rotation
 USER_AGENTS = [
@@ -34,74 +33,98 @@ def get_user_input() -> tuple[str, str]:
     
     return admission_no, first_name
 
-def make_request_with_retry(admission_no: str, first_name: str, max_retries: int = 5) -> Optional[dict]:
-    """Make API request with retry mechanism and traffic handling."""
+def build_request(admission_no: str, first_name: str) -> tuple[dict, dict]:
+    """Build the API payload and headers, with a rotating user agent."""
+    # Request payload
+    payload = {
+        "admissionNo": admission_no,
+        "firstName": first_name,
+        "turnstileToken": ""
+    }
+    
+    # Headers with rotating user agent
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": random.choice(USER_AGENTS),
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "en-US,en;q=0.9",
+        "Accept-Encoding": "gzip, deflate, br",
+        "Connection": "keep-alive",
+        "Referer": "https://eaes.et/",
+        "Origin": "https://eaes.et"
+    }
+    
+    return payload, headers
+
+def make_request_with_retry(admission_no: str, first_name: str, max_retries: int = 5,
+                            trace: Optional[Dict[str, Any]] = None, verbose: bool = True,
+                            before_attempt: Optional[Callable[[], None]] = None,
+                            pool: Optional[UpstreamPool] = None) -> Optional[dict]:
+    """Make API request with retry mechanism and traffic handling.
+    
+    If trace is given it is filled with the outcome status and retry count.
+    Progress messages are printed unless verbose is False.
+    before_attempt, if given, is called right before every request, retries included.
+    Requests go through pool, or the process-wide upstream pool when it is not given.
+    """
+    pool = pool if pool is not None else get_upstream_pool()
+    say = print if verbose else (lambda *args: None)
+    trace = {} if trace is None else trace
+    trace.update(status='not_found', retries=0, cache_hit=False)
     
     for attempt in range(max_retries):
+        trace['retries'] = attempt
         try:
             # Random delay to avoid overwhelming the server
             if attempt > 0:
                 delay = min(2 ** attempt + random.uniform(0, 1), 30)  # Exponential backoff with jitter
-                print(f"Attempt {attempt + 1}/{max_retries}. Waiting {delay:.1f} seconds before retry...")
+                say(f"Attempt {attempt + 1}/{max_retries}. Waiting {delay:.1f} seconds before retry...")
                 time.sleep(delay)
             
-            # Rotate user agent
-            user_agent = random.choice(USER_AGENTS)
+            payload, headers = build_request(admission_no, first_name)
             
-            # Request payload
-            payload = {
-                "admissionNo": admission_no,
-                "firstName": first_name,
-                "turnstileToken": ""
-            }
+            if before_attempt is not None:
+                before_attempt()
+            say(f"Making request (attempt {attempt + 1}/{max_retries})...")
             
-            # Headers with rotating user agent
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": user_agent,
-                "Accept": "application/json, text/plain, */*",
-                "Accept-Language": "en-US,en;q=0.9",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive",
-                "Referer": "https://eaes.et/",
-                "Origin": "https://eaes.et"
-            }
-            
-            print(f"Making request (attempt {attempt + 1}/{max_retries})...")
-            
-            # Send POST request with timeout
-            response = requests.post(
-                url, 
+            # Send POST request to the healthiest endpoint
+            response = pool.post(
                 json=payload, 
                 headers=headers, 
-                timeout=30,
                 allow_redirects=True
             )
             
             # Check if the request was successful
             if response.status_code == 200:
+                trace['status'] = 'found'
                 return response.json()
-            elif response.status_code == 429:  # Too Many Requests
-                print(f"Rate limited (429). Server is busy. Waiting longer...")
+            
+            trace['status'] = failure_reason(response.status_code)
+            if response.status_code == 429:  # Too Many Requests
+                say(f"Rate limited (429). Server is busy. Waiting longer...")
                 time.sleep(10 + random.uniform(0, 5))
             elif response.status_code == 503:  # Service Unavailable
-                print(f"Service temporarily unavailable (503). Retrying...")
+                say(f"Service temporarily unavailable (503). Retrying...")
                 time.sleep(5 + random.uniform(0, 3))
             else:
-                print(f"Request failed with status code: {response.status_code}")
+                say(f"Request failed with status code: {response.status_code}")
                 if attempt < max_retries - 1:
-                    print("Retrying...")
+                    say("Retrying...")
                 else:
-                    print("Response text:", response.text)
+                    say("Response text:", response.text)
                     
         except requests.exceptions.Timeout:
-            print(f"Request timed out (attempt {attempt + 1}/{max_retries})")
+            trace['status'] = 'timeout'
+            say(f"Request timed out (attempt {attempt + 1}/{max_retries})")
         except requests.exceptions.ConnectionError:
-            print(f"Connection error (attempt {attempt + 1}/{max_retries})")
+            trace['status'] = 'connection_error'
+            say(f"Connection error (attempt {attempt + 1}/{max_retries})")
         except requests.exceptions.RequestException as e:
-            print(f"Request error: {e} (attempt {attempt + 1}/{max_retries})")
+            trace['status'] = 'error'
+            say(f"Request error: {e} (attempt {attempt + 1}/{max_retries})")
         except Exception as e:
-            print(f"Unexpected error: {e} (attempt {attempt + 1}/{max_retries})")
+            trace['status'] = 'error'
+            say(f"Unexpected error: {e} (attempt {attempt + 1}/{max_retries})")
     
     return None
 
@@ -135,6 +158,12 @@ def display_results(data: dict) -> None:
 
 def main():
     """Main function to run the grade 12 results checker."""
+    if '--multi' in sys.argv[1:]:
+        # Several students at once, see cli_engine.py
+        from cli_engine import main as multi_main
+        multi_main()
+        return
+    
     try:
         # Get user input
         admission_no, first_name = get_user_input()
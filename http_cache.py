@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Compressed and conditional HTTP responses for the web front end
+Static files are read and compressed once at startup (gzip, plus brotli when
+the brotli package is installed) and served with validators, so repeat
+visits on slow mobile links cost a 304 instead of the whole page
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Dict
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# The page has no versioned URL, so browsers revalidate it hourly; assets change far less often
+PAGE_MAX_AGE = int(os.environ.get('PAGE_MAX_AGE', 3600))
+ASSET_MAX_AGE = int(os.environ.get('ASSET_MAX_AGE', 7 * 24 * 3600))
+# Results are personal and rarely change, so only the student's browser may keep them, briefly
+RESULT_CACHE_CONTROL = 'private, max-age=300'
+# Compressing smaller JSON bodies saves less than the gzip header costs
+MIN_COMPRESS_SIZE = 512
+
+def make_etag(body: bytes) -> str:
+    """A weak validator, valid for every encoding of the same content"""
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if if_none_match.strip() == '*':
+        return True
+    tag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == tag:
+            return True
+    return False
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+class StaticAsset:
+    def __init__(self, path: str, max_age: int, content_type: Optional[str] = None):
+        """Read a file and keep its compressed variants that are worth sending"""
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = make_etag(body)
+        self.mtime = int(os.path.getmtime(path))
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.cache_control = f"public, max-age={max_age}"
+        self.variants: Dict[str, bytes] = {'identity': body}
+
+        # Already-compressed files such as GIFs do not shrink, so they are sent as they are
+        compressed = {'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=11)
+        for coding, data in compressed.items():
+            if len(data) < len(body) * 0.9:
+                self.variants[coding] = data
+
+    def not_modified(self, request: web.Request) -> bool:
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def choose_encoding(self, request: web.Request) -> str:
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for coding in ('br', 'gzip'):
+            if coding in self.variants and accepted.get(coding, accepted.get('*', 0)) > 0:
+                return coding
+        return 'identity'
+
+    def response(self, request: web.Request) -> web.Response:
+        """Answer with a 304, or the best encoding the client accepts"""
+        headers = {
+            'ETag': self.etag,
+            'Last-Modified': self.last_modified,
+            'Cache-Control': self.cache_control,
+        }
+        if len(self.variants) > 1:
+            headers['Vary'] = 'Accept-Encoding'
+        if self.not_modified(request):
+            return web.Response(status=304, headers=headers)
+
+        coding = self.choose_encoding(request)
+        if coding != 'identity':
+            headers['Content-Encoding'] = coding
+        return web.Response(body=self.variants[coding], headers=headers, content_type=self.content_type)
+
+def load_assets(directory: str, max_age: int = ASSET_MAX_AGE) -> Dict[str, StaticAsset]:
+    """Load every file in a directory, keyed by file name"""
+    assets = {}
+    if not os.path.isdir(directory):
+        return assets
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and not name.startswith('.'):
+            assets[name] = StaticAsset(path, max_age)
+    logger.info(f"Loaded {len(assets)} static assets from {directory} (brotli {'on' if brotli else 'off'})")
+    return assets
+
+def conditional_json(request: web.Request, body: str) -> web.Response:
+    """A successful JSON answer with an ETag, a 304 when the client already has it"""
+    data = body.encode('utf-8')
+    etag = make_etag(data)
+    headers = {'ETag': etag, 'Cache-Control': RESULT_CACHE_CONTROL, 'Vary': 'Accept-Encoding'}
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return web.Response(status=304, headers=headers)
+
+    response = web.Response(body=data, headers=headers, content_type='application/json', charset='utf-8')
+    if len(data) >= MIN_COMPRESS_SIZE and accepted_encodings(request.headers.get('Accept-Encoding', '')).get('gzip', 0) > 0:
+        response.enable_compression(web.ContentCoding.gzip)
+    return response
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Priority lanes for result lookups
+Cache hits are answered straight away on the event loop. Upstream misses
+run in their own bounded thread pool, and retries in a smaller pool behind
+them, so a saturated upstream never delays students whose results are
+already known. Every lane keeps its own latency metrics
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+import requests
+from get_grade_12_result import build_request
+from upstream import UpstreamPool, get_upstream_pool, failure_reason
+from result_cache import get_result_cache, cache_key, ResultCache
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_WORKERS = int(os.environ.get('LANE_UPSTREAM_WORKERS', 8))
+RETRY_WORKERS = int(os.environ.get('LANE_RETRY_WORKERS', 2))
+MAX_RETRIES = 3
+# Latency percentiles are computed over this many recent lookups per lane
+LATENCY_WINDOW = 1000
+
+class Lane:
+    def __init__(self, name: str, workers: Optional[int] = None):
+        self.name = name
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"lane-{name}") if workers else None
+        self.latencies: "deque[float]" = deque(maxlen=LATENCY_WINDOW)
+        self.completed = 0
+        self.queued = 0
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float) -> None:
+        """Record the latency of one completed lookup"""
+        with self._lock:
+            self.latencies.append(latency)
+            self.completed += 1
+
+    async def run(self, func, *args):
+        """Run a blocking call on this lane's workers; latency includes the wait for a free worker"""
+        state = {'started': False, 'cancelled': False}
+
+        def call():
+            with self._lock:
+                if state['cancelled']:
+                    return None
+                state['started'] = True
+                self.queued -= 1
+                self.running += 1
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        submitted = time.monotonic()
+        with self._lock:
+            self.queued += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        finally:
+            with self._lock:
+                if not state['started']:
+                    state['cancelled'] = True
+                    self.queued -= 1
+            self.observe(time.monotonic() - submitted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                'lane': self.name,
+                'workers': self.workers,
+                'completed': self.completed,
+                'queued': self.queued,
+                'running': self.running,
+            }
+        for label, q in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            stats[label] = round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 1) if latencies else None
+        return stats
+
+def fetch_once(pool: UpstreamPool, admission_no: str, first_name: str, trace: Dict[str, Any]) -> Optional[Dict[Any, Any]]:
+    """A single upstream attempt, recording its outcome in trace"""
+    payload, headers = build_request(admission_no, first_name)
+    try:
+        response = pool.post(json=payload, headers=headers, allow_redirects=True)
+        if response.status_code == 200:
+            data = response.json()
+            trace['status'] = 'found'
+            return data
+        trace['status'] = failure_reason(response.status_code)
+    except requests.exceptions.Timeout:
+        trace['status'] = 'timeout'
+        logger.warning(f"Request timeout (attempt {trace['retries'] + 1})")
+    except requests.exceptions.ConnectionError:
+        trace['status'] = 'connection_error'
+        logger.warning(f"Connection error (attempt {trace['retries'] + 1})")
+    except Exception as e:
+        trace['status'] = 'error'
+        logger.error(f"Request error: {e}")
+    return None
+
+def retry_delay(attempt: int, status: str) -> float:
+    """Backoff before the next attempt, longer when the server says it is overloaded"""
+    if status == 'rate_limited':
+        return 5 + random.uniform(0, 3)
+    if status == 'server_error':
+        return 3 + random.uniform(0, 2)
+    return min(2 ** attempt + random.uniform(0, 1), 10)
+
+class LookupLanes:
+    def __init__(self, cache: Optional[ResultCache] = None, upstream_workers: int = UPSTREAM_WORKERS,
+                 retry_workers: int = RETRY_WORKERS, pool: Optional[UpstreamPool] = None):
+        self.cache = cache if cache is not None else get_result_cache()
+        self.pool = pool if pool is not None else get_upstream_pool()
+        self.fast = Lane('fast')
+        self.upstream = Lane('upstream', upstream_workers)
+        self.retry = Lane('retry', retry_workers)
+        # Misses in flight by cache key, so a student looked up twice at once is fetched once;
+        # thread-safe futures because the bot and the web server run separate event loops
+        self.pending: Dict[str, "Future[Optional[Dict[Any, Any]]]"] = {}
+        self._pending_lock = threading.Lock()
+
+    async def lookup(self, admission_no: str, first_name: str, trace: Optional[Dict[str, Any]] = None,
+                     max_retries: int = MAX_RETRIES) -> Optional[Dict[Any, Any]]:
+        """Look a student up, filling trace with the status, retry count and cache hit"""
+        trace = {} if trace is None else trace
+        started = time.monotonic()
+        cached = self.cache.get(cache_key(admission_no, first_name))
+        if cached is not None:
+            trace.update(status='found', retries=0, cache_hit=True)
+            self.fast.observe(time.monotonic() - started)
+            return cached
+        return await self.fetch(admission_no, first_name, trace, max_retries)
+
+    async def fetch(self, admission_no: str, first_name: str, trace: Optional[Dict[str, Any]] = None,
+                    max_retries: int = MAX_RETRIES) -> Optional[Dict[Any, Any]]:
+        """Fetch from upstream through the slow lanes and cache the result"""
+        trace = {} if trace is None else trace
+        trace.update(status='not_found', retries=0, cache_hit=False)
+        key = cache_key(admission_no, first_name)
+
+        with self._pending_lock:
+            pending = self.pending.get(key)
+            if pending is None:
+                future = self.pending[key] = Future()
+        if pending is not None:
+            data = await asyncio.shield(asyncio.wrap_future(pending))
+            trace.update(status='found' if data else 'not_found', cache_hit=data is not None)
+            return data
+
+        data = None
+        try:
+            data = await self.upstream.run(fetch_once, self.pool, admission_no, first_name, trace)
+            attempt = 1
+            # A plain "not found" answer will not change on retry
+            while data is None and attempt < max_retries and trace['status'] != 'not_found':
+                await asyncio.sleep(retry_delay(attempt, trace['status']))
+                trace['retries'] = attempt
+                data = await self.retry.run(fetch_once, self.pool, admission_no, first_name, trace)
+                attempt += 1
+
+            if data is not None:
+                self.cache.put(key, data)
+            return data
+        finally:
+            with self._pending_lock:
+                del self.pending[key]
+            future.set_result(data)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-lane counters and latency percentiles"""
+        return [self.fast.stats(), self.upstream.stats(), self.retry.stats()]
+
+_lanes: Optional[LookupLanes] = None
+_lanes_lock = threading.Lock()
+
+def get_lookup_lanes() -> LookupLanes:
+    """Return the process-wide lookup lanes"""
+    global _lanes
+    with _lanes_lock:
+        if _lanes is None:
+            _lanes = LookupLanes()
+        return _lanes
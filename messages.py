@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Message rendering for the Grade 12 Results Bot
+Every keyboard is built once at import time; messages are rendered in a
+single pass with user and API values escaped for Markdown
+"""
+
+from typing import Dict, Any, List
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Telegram's legacy Markdown only needs these escaped outside an entity
+_MARKDOWN_ESCAPES = str.maketrans({
+    '_': '\\_',
+    '*': '\\*',
+    '`': '\\`',
+    '[': '\\[',
+})
+
+def escape_markdown(value: Any) -> str:
+    """Escape a value so it is shown literally in a Markdown message"""
+    text = value if isinstance(value, str) else str(value)
+    # Nearly every name and score has nothing to escape, and a few substring checks cost far less than translate
+    if '_' in text or '*' in text or '`' in text or '[' in text:
+        return text.translate(_MARKDOWN_ESCAPES)
+    return text
+
+# Students pass with a total above this
+PASS_MARK = 300
+
+WELCOME_MESSAGE = """🎓 *Welcome to Grade 12 Results Checker!*
+
+I can help you check your Ethiopian Grade 12 examination results quickly and easily.
+
+📋 *What I need from you:*
+1️⃣ Your admission number
+2️⃣ Your first name
+
+🔍 *How to use:*
+• Send /check to start checking your results
+• Send /help if you need assistance
+• Send /cancel anytime to stop
+
+Let's get started! Send /check to begin. 🚀"""
+
+ADMISSION_PROMPT = """📝 *Step 1 of 2: Admission Number*
+
+Please send me your **admission number**.
+
+💡 *Tip:* This is the number you received when you registered for the exam.
+
+Example: 1234567890"""
+
+# The admission number is typed by the user, so it stays outside the bold entity where it can be escaped
+_NAME_PROMPT = """✅ *Admission Number Received:* {admission_no}
+
+📝 *Step 2 of 2: First Name*
+
+Now please send me your **first name** exactly as it appears on your exam registration.
+
+💡 *Tip:* Use the same spelling as in your official documents."""
+
+HELP_TEXT = """❓ *How to Use Grade 12 Results Checker*
+
+🔍 *To check your results:*
+1. Send /check or click "Check Results"
+2. Enter your admission number
+3. Enter your first name
+4. Wait for your results!
+
+📋 *Commands:*
+• /start - Welcome message
+• /check - Start checking results
+• /help - Show this help message
+• /cancel - Cancel current operation
+
+💡 *Tips:*
+• Make sure your admission number and name are correct
+• Use the same spelling as in your official documents
+• If results aren't found, double-check your information
+
+🆘 *Need more help?*
+Contact the bot administrator for assistance."""
+
+INVALID_ADMISSION = "❌ Please enter a valid admission number.\n\nTry again:"
+INVALID_NAME = "❌ Please enter a valid first name.\n\nTry again:"
+
+CHECKING = (
+    "🔍 *Checking your results...*\n\n"
+    "⏳ Please wait while I fetch your information from the server.\n\n"
+    "This may take a few moments..."
+)
+
+RESTARTING = (
+    "🔄 *The bot is restarting.*\n\n"
+    "Please send /check again in a minute."
+)
+
+NOT_FOUND = (
+    "❌ *Sorry, I couldn't find your results.*\n\n"
+    "This could be because:\n"
+    "• The admission number or name is incorrect\n"
+    "• The server is currently busy\n"
+    "• Your results are not yet available\n\n"
+    "💡 *Try again:* Send /check to start over"
+)
+
+LOOKUP_ERROR = (
+    "❌ *An error occurred while checking your results.*\n\n"
+    "Please try again later or contact support.\n\n"
+    "💡 *Try again:* Send /check to start over"
+)
+
+CANCELLED = (
+    "❌ *Operation cancelled.*\n\n"
+    "Send /check to start checking results again."
+)
+
+RESULTS_DONE = (
+    "✅ *Results retrieved successfully!*\n\n"
+    "Need to check another result? Use the button below:"
+)
+
+NO_RESULTS = "📊 *No subject results found.*"
+
+PASS_MESSAGE = "🎉 *Congratulations! You passed!* 🎉\n\nYour hard work paid off!"
+FAIL_MESSAGE = "😔 *You didn't pass this time*\n\nDon't give up! You can try again next time. Keep studying and you'll succeed! 💪"
+
+PASS_GIF = "assets/tom-and-jerry-throwing-flowers-celebration-dance.gif"
+FAIL_GIF = "assets/sushichaeng-tom-and-jerry.gif"
+
+# Keyboards are immutable, so one instance serves every message
+MAIN_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Check Results", callback_data="start_check")],
+    [InlineKeyboardButton("❓ Help", callback_data="help")]
+])
+HELP_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Check Results", callback_data="start_check")]
+])
+RESULTS_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔍 Check Another Result", callback_data="start_check")],
+    [InlineKeyboardButton("❓ Help", callback_data="help")]
+])
+
+def render_name_prompt(admission_no: str) -> str:
+    """Confirm the admission number and ask for the first name"""
+    return _NAME_PROMPT.format(admission_no=escape_markdown(admission_no))
+
+def render_student_info(student: Dict[str, Any]) -> str:
+    """Render the student information message"""
+    get = student.get
+    return f"""👨‍🎓 *STUDENT INFORMATION*
+
+📝 **Name:** {escape_markdown(get('FullName', 'N/A'))}
+🎓 **Admission No:** {escape_markdown(get('Admission_No', 'N/A'))}
+👤 **Gender:** {escape_markdown(get('Sex', 'N/A'))}
+🏫 **School:** {escape_markdown(get('School', 'N/A'))}
+📚 **Stream:** {escape_markdown(get('Stream', 'N/A'))}"""
+
+def result_total(results: List[Dict[str, Any]]) -> float:
+    """The total score, which the API sends as the last result"""
+    if not results:
+        return 0
+    total = results[-1].get('Result', 'N/A')
+    if isinstance(total, (int, float)):
+        return total
+    if isinstance(total, str) and total.replace('.', '', 1).isdigit():
+        return float(total)
+    return 0
+
+def render_results(results: List[Dict[str, Any]]) -> str:
+    """Render the subject results message in a single pass"""
+    if not results:
+        return NO_RESULTS
+    lines = ''.join([
+        f"📖 **{escape_markdown(r.get('Subject', 'N/A'))}:** {escape_markdown(r.get('Result', 'N/A'))}\n"
+        for r in results
+    ])
+    return f"📊 *SUBJECT RESULTS*\n\n{lines}\n🎯 **Total Result:** {escape_markdown(results[-1].get('Result', 'N/A'))}"
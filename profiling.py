@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling for the Grade 12 Results Bot
+A sampling profiler that reports collapsed stacks (the input format of
+flamegraph.pl and speedscope), and a watchdog that logs what the event loop
+was doing whenever a callback blocks it for too long
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+import traceback
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+MAX_PROFILE_SECONDS = 60
+# Callbacks blocking an event loop for longer than this are logged
+SLOW_CALLBACK_SECONDS = float(os.environ.get('SLOW_CALLBACK_MS', 250)) / 1000
+# Profiles of processes that serve no HTTP (the pre-fork master) are written here
+PROFILE_DIR = os.environ.get('PROFILE_DIR', tempfile.gettempdir())
+
+# Event loops to annotate with their running task, keyed by thread id
+_loops: Dict[int, asyncio.AbstractEventLoop] = {}
+_loops_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+def register_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Tag samples from the thread running this loop with the current task name"""
+    with _loops_lock:
+        _loops[threading.get_ident()] = loop
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame) -> List[str]:
+    """Return the frames of a stack, outermost first"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+def sample_profile(seconds: float, interval: float = SAMPLE_INTERVAL) -> str:
+    """Sample every thread's stack for a while and return collapsed stacks with counts"""
+    seconds = max(0.1, min(seconds, MAX_PROFILE_SECONDS))
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+
+    try:
+        counts: Counter = Counter()
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with _loops_lock:
+                loops = dict(_loops)
+
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = [names.get(ident, f"thread-{ident}")]
+                loop = loops.get(ident)
+                if loop is not None and not loop.is_closed():
+                    task = asyncio.current_task(loop)
+                    stack.append(f"task:{task.get_name()}" if task else "task:<callbacks>")
+                stack.extend(collapse_stack(frame))
+                counts[';'.join(label.replace(';', ':') for label in stack)] += 1
+
+            time.sleep(interval)
+    finally:
+        _profile_lock.release()
+
+    return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+def profile_to_file(seconds: float, directory: str = PROFILE_DIR) -> Optional[str]:
+    """Sample this process and write the collapsed stacks to a file, returns its path"""
+    try:
+        stacks = sample_profile(seconds)
+    except RuntimeError as e:
+        logger.warning(f"Profile not taken: {e}")
+        return None
+    path = os.path.join(directory, f"profile-{os.getpid()}-{int(time.time())}.folded")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(stacks)
+    logger.info(f"Wrote {seconds:.0f}s profile to {path}")
+    return path
+
+def profile_in_background(seconds: float, directory: str = PROFILE_DIR) -> threading.Thread:
+    """Take a profile_to_file in a thread, so it can be started from a signal handler"""
+    thread = threading.Thread(target=profile_to_file, args=(seconds, directory), name="profiler", daemon=True)
+    thread.start()
+    return thread
+
+class LoopWatchdog:
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = SLOW_CALLBACK_SECONDS, name: str = 'loop'):
+        self.loop = loop
+        self.threshold = threshold
+        self.name = name
+        self.last_tick = time.monotonic()
+        self.thread_id: Optional[int] = None
+        self.stalls = 0
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start ticking on the loop (call from the loop's thread) and monitoring from a thread"""
+        self.thread_id = threading.get_ident()
+        self.loop.call_soon(self._tick)
+        threading.Thread(target=self._monitor, name=f"watchdog-{self.name}", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _tick(self) -> None:
+        self.last_tick = time.monotonic()
+        if not self._stopped.is_set():
+            self.loop.call_later(self.threshold / 4, self._tick)
+
+    def _monitor(self) -> None:
+        reported = False
+        while not self._stopped.wait(self.threshold / 4):
+            if self.loop.is_closed():
+                return
+            blocked = time.monotonic() - self.last_tick
+            if blocked > self.threshold and not reported:
+                # Log once per stall, with the stack that is holding the loop
+                reported = True
+                self.stalls += 1
+                frame = sys._current_frames().get(self.thread_id)
+                stack = ''.join(traceback.format_stack(frame)) if frame else ''
+                logger.warning(f"Event loop '{self.name}' blocked for over {blocked * 1000:.0f}ms:\n{stack}")
+            elif blocked <= self.threshold and reported:
+                reported = False
+
+def watch_loop(name: str, threshold: float = SLOW_CALLBACK_SECONDS) -> LoopWatchdog:
+    """Register the running loop for profiling and start a slow-callback watchdog on it"""
+    loop = asyncio.get_running_loop()
+    register_loop(loop)
+    watchdog = LoopWatchdog(loop, threshold, name)
+    watchdog.start()
+    return watchdog
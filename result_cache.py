@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Result cache for the Grade 12 Results Bot
+Keeps recent lookups in memory and, when a path is configured, in a SQLite
+file that every web worker and the bot process can share
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Results do not change once published, so entries can live for hours
+DEFAULT_TTL = int(os.environ.get('RESULT_CACHE_TTL', 6 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_SIZE', 10000))
+# Expired rows are deleted from the shared file this often, and it never keeps more rows than this
+PRUNE_INTERVAL = 60
+DEFAULT_MAX_ROWS = int(os.environ.get('RESULT_CACHE_DISK_SIZE', 200000))
+# Used by web workers and the warm-up job when RESULT_CACHE_PATH is not set
+SHARED_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'grade12_results.sqlite3')
+
+def cache_key(admission_no: str, first_name: str) -> str:
+    """Build the cache key for a student lookup"""
+    return f"{admission_no.strip()}:{first_name.strip().lower()}"
+
+class ResultCache:
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 max_rows: int = DEFAULT_MAX_ROWS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._pruned_at = 0.0
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (expires_at, json_text)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, body TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_expires ON results (expires)")
+
+    def get_json(self, key: str) -> Optional[str]:
+        """Return the cached result as JSON text, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT body, expires FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache read failed: {e}")
+                    row = None
+                if row and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def get(self, key: str) -> Optional[Dict[Any, Any]]:
+        """Return the cached result, or None on a miss"""
+        body = self.get_json(key)
+        return json.loads(body) if body is not None else None
+
+    def put(self, key: str, data: Dict[Any, Any], ttl: Optional[float] = None) -> str:
+        """Store a result and return its compact JSON text"""
+        body = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+        self.put_json(key, body, ttl)
+        return body
+
+    def put_json(self, key: str, body: str, ttl: Optional[float] = None) -> None:
+        """Store a result that is already serialized"""
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires, body)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, body, expires) VALUES (?, ?, ?)",
+                        (key, body, expires)
+                    )
+                    if time.time() - self._pruned_at >= PRUNE_INTERVAL:
+                        self._prune()
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache write failed: {e}")
+
+    def _prune(self) -> None:
+        """Delete expired rows, then the ones closest to expiring if the file is still over max_rows"""
+        now = time.time()
+        self._pruned_at = now
+        self._db.execute("DELETE FROM results WHERE expires <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,)
+        )
+
+    def items(self) -> List[Tuple[str, float, str]]:
+        """Return the live entries as (key, expires_at, json_text), coldest first
+
+        Rows only in the shared file (fetched by other processes) come before the
+        in-memory ones, the most recently stored of them last.
+        """
+        now = time.time()
+        with self._lock:
+            memory = [(key, expires, body) for key, (expires, body) in self._entries.items() if expires > now]
+            shared = []
+            if self._db is not None:
+                try:
+                    shared = [
+                        row for row in self._db.execute(
+                            "SELECT key, expires, body FROM results WHERE expires > ? ORDER BY expires", (now,)
+                        ) if row[0] not in self._entries
+                    ]
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache read failed: {e}")
+            return shared + memory
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared': self._db is not None,
+            }
+
+    def close(self) -> None:
+        """Close the shared database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _remember(self, key: str, expires: float, body: str) -> None:
+        self._entries[key] = (expires, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide cache, shared on disk when RESULT_CACHE_PATH is set"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(os.environ.get('RESULT_CACHE_PATH') or None)
+        return _cache
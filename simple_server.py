@@ -7,7 +7,7 @@ import os
 import threading
 import time
 import asyncio
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from telegram_bot import Grade12ResultBot
 
 class HealthHandler(BaseHTTPRequestHandler):
@@ -24,7 +24,7 @@ class HealthHandler(BaseHTTPRequestHandler):
 def start_web_server():
     """Start a simple web server for health checks"""
     port = int(os.environ.get('PORT', 8080))
-    server = HTTPServer(('0.0.0.0', port), HealthHandler)
+    server = ThreadingHTTPServer(('0.0.0.0', port), HealthHandler)
     print(f"Health check server started on port {port}")
     server.serve_forever()
 
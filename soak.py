@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Chaos and soak testing for the lookup retry paths
+A local fake results server plays scripted failures (rising 429s, slow drips,
+connection resets, half-open sockets) while make_request_with_retry and the
+bot's make_api_request run against it for hours. Memory, file descriptors,
+threads, event-loop lag and throughput are sampled over time, and leaks or
+retry storms fail the run
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import itertools
+import threading
+import statistics
+import multiprocessing
+from typing import Optional, Dict, Any, List, Tuple
+import lanes
+import event_log
+from upstream import UpstreamPool, CONNECT_TIMEOUT
+from lanes import LookupLanes
+from result_cache import ResultCache
+from get_grade_12_result import make_request_with_retry
+from telegram_bot import Grade12ResultBot
+
+logger = logging.getLogger(__name__)
+
+BEHAVIOURS = ('ok', 'rate_limited', 'drip', 'reset', 'half_open')
+# Answers that refuse the request, as opposed to answering it slowly
+REJECTIONS = ('rate_limited', 'reset', 'half_open')
+SCENARIOS = ('rising-429', 'slow-drip', 'resets', 'half-open')
+# Both retry paths give up after this many attempts in the soak
+MAX_ATTEMPTS = 3
+
+def scenario_weights(name: str, progress: float) -> Dict[str, float]:
+    """Share of requests answered with each behaviour, progress running from 0 to 1 through the phase"""
+    if name == 'rising-429':
+        rate = min(0.95, progress)
+        return {'ok': 1 - rate, 'rate_limited': rate}
+    if name == 'slow-drip':
+        return {'ok': 0.5, 'drip': 0.5}
+    if name == 'resets':
+        return {'ok': 0.6, 'reset': 0.4}
+    if name == 'half-open':
+        return {'ok': 0.8, 'half_open': 0.2}
+    return {'ok': 1.0}
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """Read one HTTP request and return its body, or None when the client hung up"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+        length = 0
+        for line in head.split(b'\r\n')[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                length = int(value)
+        return await reader.readexactly(length) if length else b''
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+
+def result_body(request_body: bytes) -> bytes:
+    try:
+        request = json.loads(request_body)
+    except ValueError:
+        request = {}
+    return json.dumps({
+        "studentInfo": {"FullName": request.get('firstName', ''), "Admission_No": request.get('admissionNo', '')},
+        "results": [{"Subject": f"Subject {n}", "Result": "60"} for n in range(8)],
+    }).encode()
+
+class FakeUpstream:
+    def __init__(self, weights, counts, drip_seconds: float):
+        """A results server whose answers are drawn from weights shared with the soak runner"""
+        self.weights = weights
+        self.counts = counts
+        self.drip_seconds = drip_seconds
+
+    def choose(self) -> str:
+        weights = list(self.weights)
+        pick = random.random() * (sum(weights) or 1)
+        for behaviour, weight in zip(BEHAVIOURS, weights):
+            pick -= weight
+            if pick < 0:
+                return behaviour
+        return 'ok'
+
+    async def serve(self, ready) -> None:
+        server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        ready.put(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                body = await read_request(reader)
+                if body is None:
+                    return
+                behaviour = self.choose()
+                with self.counts.get_lock():
+                    self.counts[BEHAVIOURS.index(behaviour)] += 1
+
+                if behaviour == 'reset':
+                    # Linger 0 makes close send a RST instead of a FIN
+                    sock = writer.get_extra_info('socket')
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    writer.transport.abort()
+                    return
+                if behaviour == 'half_open':
+                    # Take the request and never answer, until the client gives up
+                    while await reader.read(65536):
+                        pass
+                    return
+                if behaviour == 'rate_limited':
+                    writer.write(b"HTTP/1.1 429 Too Many Requests\r\nRetry-After: 5\r\nContent-Length: 0\r\n\r\n")
+                    await writer.drain()
+                    continue
+
+                payload = result_body(body)
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                )
+                if behaviour == 'drip':
+                    # Trickle the body out so every read succeeds but the answer takes drip_seconds
+                    chunks = max(1, int(self.drip_seconds))
+                    size = -(-len(payload) // chunks)
+                    for start in range(0, len(payload), size):
+                        await asyncio.sleep(self.drip_seconds / chunks)
+                        writer.write(payload[start:start + size])
+                        await writer.drain()
+                else:
+                    writer.write(payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if not writer.is_closing():
+                writer.close()
+
+def run_fake_upstream(weights, counts, ready, drip_seconds: float) -> None:
+    """Entry point of the fake upstream process"""
+    asyncio.run(FakeUpstream(weights, counts, drip_seconds).serve(ready))
+
+def start_fake_upstream(drip_seconds: float = 20):
+    """Start the fake upstream in its own process so its memory and sockets are not measured"""
+    ctx = multiprocessing.get_context('spawn')
+    weights = ctx.Array('d', [1.0] + [0.0] * (len(BEHAVIOURS) - 1))
+    counts = ctx.Array('q', len(BEHAVIOURS))
+    ready = ctx.Queue()
+    process = ctx.Process(target=run_fake_upstream, args=(weights, counts, ready, drip_seconds),
+                          name="fake-upstream", daemon=True)
+    process.start()
+    port = ready.get(timeout=30)
+    return process, f"http://127.0.0.1:{port}/api/v1/results/web", weights, counts
+
+def set_weights(weights, shares: Dict[str, float]) -> None:
+    with weights.get_lock():
+        for index, behaviour in enumerate(BEHAVIOURS):
+            weights[index] = shares.get(behaviour, 0.0)
+
+def rss_mb() -> float:
+    """Resident memory of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        # Peak rather than current on platforms without /proc
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def open_fds() -> int:
+    """Open file descriptors of this process, -1 if they cannot be counted"""
+    for directory in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(directory))
+        except OSError:
+            continue
+    return -1
+
+class SoakRunner:
+    def __init__(self, hours: float = 1.0, scenarios: Tuple[str, ...] = SCENARIOS, threads: int = 4,
+                 tasks: int = 4, think: float = 0.5, sample_interval: float = 10, read_timeout: float = 10,
+                 drip_seconds: float = 20, csv_path: Optional[str] = None, quiet: bool = False):
+        self.duration = hours * 3600
+        self.scenarios = scenarios
+        self.threads = threads
+        self.tasks = tasks
+        self.think = think
+        self.sample_interval = sample_interval
+        self.read_timeout = read_timeout
+        self.drip_seconds = drip_seconds
+        self.csv_path = csv_path
+        self.quiet = quiet
+        self.samples: List[Dict[str, Any]] = []
+        self.phase = 'baseline'
+        self.stopping = threading.Event()
+        self.admission_numbers = itertools.count(1)
+        # Client name -> [lookups finished, results found]
+        self.completed = {'retry': [0, 0], 'bot': [0, 0]}
+        self._lock = threading.Lock()
+        self.max_lag = 0.0
+        self.counts = None
+        self.pool: Optional[UpstreamPool] = None
+
+    def phases(self) -> List[Tuple[str, float]]:
+        """A healthy baseline, each failure scenario in turn, then a healthy recovery to compare against"""
+        edge = self.duration * 0.15
+        middle = (self.duration - 2 * edge) / max(1, len(self.scenarios))
+        return [('baseline', edge)] + [(name, middle) for name in self.scenarios] + [('recovery', edge)]
+
+    def record(self, client: str, trace: Dict[str, Any]) -> None:
+        with self._lock:
+            self.completed[client][0] += 1
+            self.completed[client][1] += trace.get('status') == 'found'
+
+    def sync_client(self) -> None:
+        """Loop make_request_with_retry on a thread, as the CLI and warm-up do"""
+        while not self.stopping.is_set():
+            trace: Dict[str, Any] = {}
+            make_request_with_retry(str(next(self.admission_numbers)), 'soak', MAX_ATTEMPTS, trace, verbose=False,
+                                    pool=self.pool)
+            self.record('retry', trace)
+            self.stopping.wait(self.think)
+
+    async def bot_client(self, bot) -> None:
+        """Loop the bot's make_api_request on the event loop"""
+        while True:
+            trace: Dict[str, Any] = {}
+            await bot.make_api_request(str(next(self.admission_numbers)), 'soak', MAX_ATTEMPTS, trace=trace)
+            self.record('bot', trace)
+            await asyncio.sleep(self.think)
+
+    async def watch_lag(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(0.1)
+            self.max_lag = max(self.max_lag, time.monotonic() - started - 0.1)
+
+    async def sampler(self, started: float) -> None:
+        previous = None
+        while True:
+            await asyncio.sleep(self.sample_interval)
+            with self._lock:
+                lookups = sum(c[0] for c in self.completed.values())
+                found = sum(c[1] for c in self.completed.values())
+            with self.counts.get_lock():
+                counts = dict(zip(BEHAVIOURS, self.counts))
+            current = {'lookups': lookups, 'found': found, **counts}
+            if previous is not None:
+                self.add_sample(time.monotonic() - started, current, previous)
+            previous = current
+
+    def add_sample(self, elapsed: float, current: Dict[str, int], previous: Dict[str, int]) -> None:
+        delta = {key: current[key] - previous[key] for key in current}
+        requests_made = sum(delta[b] for b in BEHAVIOURS)
+        sample = {
+            't': round(elapsed, 1),
+            'phase': self.phase,
+            'rss_mb': round(rss_mb(), 1),
+            'fds': open_fds(),
+            'threads': threading.active_count(),
+            'tasks': len(asyncio.all_tasks()),
+            'loop_lag_ms': round(self.max_lag * 1000, 1),
+            'lookups_s': round(delta['lookups'] / self.sample_interval, 2),
+            'found_pct': round(100 * delta['found'] / delta['lookups'], 1) if delta['lookups'] else None,
+            'upstream_s': round(requests_made / self.sample_interval, 2),
+            'rejected_pct': round(100 * sum(delta[b] for b in REJECTIONS) / requests_made, 1) if requests_made else None,
+            'upstream_total': sum(current[b] for b in BEHAVIOURS),
+            'lookups_total': current['lookups'],
+        }
+        self.max_lag = 0.0
+        self.samples.append(sample)
+        if not self.quiet:
+            if len(self.samples) == 1:
+                print(f"{'time':>8} {'phase':<11} {'rss MB':>7} {'fds':>4} {'thr':>4} {'lag ms':>7} "
+                      f"{'lookup/s':>8} {'found%':>6} {'req/s':>6} {'rej%':>5}")
+            print(f"{sample['t']:>7.0f}s {sample['phase']:<11} {sample['rss_mb']:>7.1f} {sample['fds']:>4} "
+                  f"{sample['threads']:>4} {sample['loop_lag_ms']:>7.1f} {sample['lookups_s']:>8.2f} "
+                  f"{sample['found_pct'] if sample['found_pct'] is not None else '-':>6} "
+                  f"{sample['upstream_s']:>6.2f} {sample['rejected_pct'] if sample['rejected_pct'] is not None else '-':>5}",
+                  flush=True)
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """Play every phase against both retry paths and return the samples"""
+        process, url, weights, self.counts = start_fake_upstream(self.drip_seconds)
+        saved_lanes, saved_log_dir = lanes._lanes, event_log.EVENT_LOG_DIR
+        # The clients get their own pool rather than the process-wide one, so a client thread
+        # outliving the run can never leave other code pointed at the stopped fake upstream
+        self.pool = UpstreamPool([url], timeout=(CONNECT_TIMEOUT, self.read_timeout))
+        # Every lookup uses a fresh admission number, so a small cache keeps memory flat
+        lanes._lanes = soak_lanes = LookupLanes(cache=ResultCache(max_entries=500), pool=self.pool)
+        event_log.EVENT_LOG_DIR = ''
+
+        bot = Grade12ResultBot("soak:test")
+
+        threads = [threading.Thread(target=self.sync_client, name=f"soak-retry-{n}", daemon=True)
+                   for n in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        started = time.monotonic()
+        background = [asyncio.create_task(self.bot_client(bot)) for _ in range(self.tasks)]
+        background += [asyncio.create_task(self.watch_lag()), asyncio.create_task(self.sampler(started))]
+
+        try:
+            for name, duration in self.phases():
+                self.phase = name
+                phase_started = time.monotonic()
+                while (elapsed := time.monotonic() - phase_started) < duration:
+                    set_weights(weights, scenario_weights(name, elapsed / duration))
+                    await asyncio.sleep(min(1.0, duration - elapsed))
+        finally:
+            self.stopping.set()
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            for thread in threads:
+                thread.join(timeout=1)
+            soak_lanes.upstream.executor.shutdown(wait=False, cancel_futures=True)
+            soak_lanes.retry.executor.shutdown(wait=False, cancel_futures=True)
+            process.terminate()
+            process.join(5)
+            lanes._lanes, event_log.EVENT_LOG_DIR = saved_lanes, saved_log_dir
+
+        if self.csv_path and self.samples:
+            with open(self.csv_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.samples[0]))
+                writer.writeheader()
+                writer.writerows(self.samples)
+        return self.samples
+
+def settled(samples: List[Dict[str, Any]], phase: str) -> List[Dict[str, Any]]:
+    """The second half of a phase's samples, once start-up or the previous phase has worn off"""
+    matching = [s for s in samples if s['phase'] == phase]
+    return matching[len(matching) // 2:]
+
+def evaluate(samples: List[Dict[str, Any]], clients: int, max_rss_growth: float = 32, max_fd_growth: int = 16,
+             max_thread_growth: int = 4, max_loop_lag_ms: float = 250, storm_rps_per_client: float = 0.5) -> List[str]:
+    """Return the reasons the soak failed, empty when it passed"""
+    failures = []
+    baseline, recovery = settled(samples, 'baseline'), settled(samples, 'recovery')
+    if not baseline or not recovery:
+        return ["Run too short: no settled baseline or recovery samples to compare"]
+
+    # Resources should come back to where they were once the brown-out is over
+    rss_growth = statistics.median(s['rss_mb'] for s in recovery) - statistics.median(s['rss_mb'] for s in baseline)
+    if rss_growth > max_rss_growth:
+        failures.append(f"Memory leak: RSS grew {rss_growth:.1f} MB from baseline to recovery")
+    fd_growth = min(s['fds'] for s in recovery) - min(s['fds'] for s in baseline)
+    if fd_growth > max_fd_growth:
+        failures.append(f"File descriptor leak: {fd_growth} more open after recovery than at baseline")
+    thread_growth = min(s['threads'] for s in recovery) - max(s['threads'] for s in baseline)
+    if thread_growth > max_thread_growth:
+        failures.append(f"Thread leak: {thread_growth} more threads after recovery than at baseline")
+
+    worst_lag = max(s['loop_lag_ms'] for s in samples)
+    if worst_lag > max_loop_lag_ms:
+        failures.append(f"Event loop blocked for {worst_lag:.0f} ms")
+
+    baseline_rate = statistics.mean(s['lookups_s'] for s in baseline)
+    recovery_rate = statistics.mean(s['lookups_s'] for s in recovery)
+    if recovery_rate < baseline_rate / 2:
+        failures.append(f"Throughput did not recover: {recovery_rate:.2f} lookups/s against {baseline_rate:.2f} at baseline")
+
+    # Backoff has to thin out requests while the upstream is refusing them
+    storm_limit = clients * storm_rps_per_client
+    for s in samples:
+        if s['rejected_pct'] is not None and s['rejected_pct'] >= 80 and s['upstream_s'] > storm_limit:
+            failures.append(f"Retry storm at {s['t']:.0f}s: {s['upstream_s']:.1f} requests/s while "
+                            f"{s['rejected_pct']:.0f}% were rejected (limit {storm_limit:.1f})")
+            break
+
+    # Each lookup may make at most MAX_ATTEMPTS requests; lookups still in flight get one round each
+    last = samples[-1]
+    allowed = MAX_ATTEMPTS * (last['lookups_total'] + clients)
+    if last['upstream_total'] > allowed:
+        failures.append(f"Retry amplification: {last['upstream_total']} upstream requests for "
+                        f"{last['lookups_total']} lookups (at most {allowed})")
+    return failures
+
+def summarize(samples: List[Dict[str, Any]]) -> None:
+    """Print per-phase averages"""
+    print("\n" + "=" * 78)
+    print(f"{'phase':<11} {'lookup/s':>8} {'found%':>7} {'req/s':>6} {'rej%':>5} {'max lag':>8} {'rss MB':>7} {'fds':>5}")
+    phases = list(dict.fromkeys(s['phase'] for s in samples))
+    for phase in phases:
+        rows = [s for s in samples if s['phase'] == phase]
+        found = [s['found_pct'] for s in rows if s['found_pct'] is not None]
+        rejected = [s['rejected_pct'] for s in rows if s['rejected_pct'] is not None]
+        print(f"{phase:<11} {statistics.mean(s['lookups_s'] for s in rows):>8.2f} "
+              f"{statistics.mean(found) if found else 0:>7.1f} {statistics.mean(s['upstream_s'] for s in rows):>6.2f} "
+              f"{statistics.mean(rejected) if rejected else 0:>5.1f} {max(s['loop_lag_ms'] for s in rows):>7.1f}ms "
+              f"{max(s['rss_mb'] for s in rows):>7.1f} {max(s['fds'] for s in rows):>5}")
+    print("=" * 78)
+
+def main():
+    """Run a soak test and exit non-zero if it found leaks or retry storms"""
+    parser = argparse.ArgumentParser(description="Soak the retry paths against a misbehaving fake upstream")
+    parser.add_argument('--hours', type=float, default=1.0, help="total run time")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--threads', type=int, default=4, help="make_request_with_retry clients")
+    parser.add_argument('--tasks', type=int, default=4, help="make_api_request clients")
+    parser.add_argument('--think', type=float, default=0.5, help="seconds each client waits between lookups")
+    parser.add_argument('--sample', type=float, default=10, help="seconds between samples")
+    parser.add_argument('--read-timeout', type=float, default=10, help="upstream read timeout")
+    parser.add_argument('--drip', type=float, default=20, help="seconds a slow-drip answer takes")
+    parser.add_argument('--csv', help="write the samples to this file")
+    parser.add_argument('--max-rss-growth', type=float, default=32, help="MB")
+    parser.add_argument('--max-fd-growth', type=int, default=16)
+    parser.add_argument('--max-loop-lag', type=float, default=250, help="ms")
+    args = parser.parse_args()
+
+    # The failures are deliberate, keep their warnings out of the report
+    logging.getLogger().setLevel(logging.ERROR)
+
+    runner = SoakRunner(hours=args.hours, scenarios=SCENARIOS if args.scenario == 'all' else (args.scenario,),
+                        threads=args.threads, tasks=args.tasks, think=args.think, sample_interval=args.sample,
+                        read_timeout=args.read_timeout, drip_seconds=args.drip, csv_path=args.csv)
+    print(f"Soaking for {args.hours:g}h: " + " → ".join(f"{name} ({duration / 60:.0f}m)" for name, duration in runner.phases()))
+    try:
+        samples = asyncio.run(runner.run())
+    except KeyboardInterrupt:
+        print("\nSoak interrupted.")
+        samples = runner.samples
+
+    if not samples:
+        print("❌ No samples collected.")
+        sys.exit(1)
+    summarize(samples)
+    failures = evaluate(samples, args.threads + args.tasks, max_rss_growth=args.max_rss_growth,
+                        max_fd_growth=args.max_fd_growth, max_loop_lag_ms=args.max_loop_lag)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ No leaks or retry storms found.")
+
+if __name__ == '__main__':
+    main()
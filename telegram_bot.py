@@ -1,11 +1,18 @@
 import os
-import requests
+import signal
+import asyncio
+import threading
 import time
-import random
 from typing import Optional, Dict, Any
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler
 import logging
+from result_cache import get_result_cache
+from warm_state import save_snapshot, load_snapshot
+from lanes import get_lookup_lanes
+from event_log import get_event_log, close_event_log
+from profiling import watch_loop
+import messages
 
 # Enable logging
 logging.basicConfig(
@@ -17,22 +24,28 @@ logger = logging.getLogger(__name__)
 # Conversation states
 WAITING_FOR_ADMISSION, WAITING_FOR_NAME = range(2)
 
-# API endpoint
-API_URL = "https://api.eaes.et/api/v1/results/web"
-
-# User agents for rotation
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:89.0) Gecko/20100101 Firefox/89.0"
-]
+# Seconds to let in-flight lookups finish on shutdown
+DRAIN_TIMEOUT = float(os.environ.get('DRAIN_TIMEOUT', 20))
 
 class Grade12ResultBot:
     def __init__(self, token: str):
         self.token = token
-        self.application = Application.builder().token(token).build()
+        self.application = (
+            Application.builder()
+            .token(token)
+            .post_init(self.post_init)
+            .build()
+        )
+        self.result_cache = get_result_cache()
+        self.lanes = get_lookup_lanes()
+        self.event_log = get_event_log()
+        # Telegram file ids of GIFs already uploaded, keyed by local path
+        self.media_ids: Dict[str, str] = {}
+        self.draining = False
+        self.stop_requested = False
+        self.in_flight = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.shutdown_task: Optional[asyncio.Task] = None
         self.setup_handlers()
     
     def setup_handlers(self):
@@ -46,7 +59,9 @@ class Grade12ResultBot:
             ],
             states={
                 WAITING_FOR_ADMISSION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_admission_number)],
-                WAITING_FOR_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_first_name)],
+                # Updates stay sequential, as ConversationHandler needs; only the slow lookup runs
+                # in the background, so other users are never stuck behind it
+                WAITING_FOR_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_first_name, block=False)],
             },
             fallbacks=[CommandHandler('cancel', self.cancel_command)],
         )
@@ -55,51 +70,29 @@ class Grade12ResultBot:
         self.application.add_handler(CommandHandler('help', self.help_command))
         self.application.add_handler(CallbackQueryHandler(self.help_from_button, pattern='^help$'))
     
+    async def post_init(self, application: Application) -> None:
+        """Remember the bot's event loop and handle stop signals when running in the main thread"""
+        self.loop = asyncio.get_running_loop()
+        watch_loop("bot")
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self.loop.add_signal_handler(sig, self.request_shutdown)
+        # A stop requested while the bot was starting could not reach this loop yet
+        if self.stop_requested:
+            self._start_shutdown()
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the conversation"""
-        welcome_message = """
-🎓 *Welcome to Grade 12 Results Checker!*
-
-I can help you check your Ethiopian Grade 12 examination results quickly and easily.
-
-📋 *What I need from you:*
-1️⃣ Your admission number
-2️⃣ Your first name
-
-🔍 *How to use:*
-• Send /check to start checking your results
-• Send /help if you need assistance
-• Send /cancel anytime to stop
-
-Let's get started! Send /check to begin. 🚀
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Check Results", callback_data="start_check")],
-            [InlineKeyboardButton("❓ Help", callback_data="help")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await update.message.reply_text(
-            welcome_message, 
+            messages.WELCOME_MESSAGE, 
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=messages.MAIN_KEYBOARD
         )
         return ConversationHandler.END
     
     async def start_check_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start the result checking process"""
-        message = """
-📝 *Step 1 of 2: Admission Number*
-
-Please send me your **admission number**.
-
-💡 *Tip:* This is the number you received when you registered for the exam.
-
-Example: 1234567890
-        """
-        
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await update.message.reply_text(messages.ADMISSION_PROMPT, parse_mode='Markdown')
         return WAITING_FOR_ADMISSION
     
     async def get_admission_number(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -107,25 +100,13 @@ Example: 1234567890
         admission_no = update.message.text.strip()
         
         if not admission_no:
-            await update.message.reply_text(
-                "❌ Please enter a valid admission number.\n\nTry again:"
-            )
+            await update.message.reply_text(messages.INVALID_ADMISSION)
             return WAITING_FOR_ADMISSION
         
         # Store admission number in context
         context.user_data['admission_no'] = admission_no
         
-        message = f"""
-✅ *Admission Number Received: {admission_no}*
-
-📝 *Step 2 of 2: First Name*
-
-Now please send me your **first name** exactly as it appears on your exam registration.
-
-💡 *Tip:* Use the same spelling as in your official documents.
-        """
-        
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await update.message.reply_text(messages.render_name_prompt(admission_no), parse_mode='Markdown')
         return WAITING_FOR_NAME
     
     async def get_first_name(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -133,268 +114,127 @@ Now please send me your **first name** exactly as it appears on your exam regist
         first_name = update.message.text.strip()
         
         if not first_name:
-            await update.message.reply_text(
-                "❌ Please enter a valid first name.\n\nTry again:"
-            )
+            await update.message.reply_text(messages.INVALID_NAME)
             return WAITING_FOR_NAME
         
         # Get stored admission number
         admission_no = context.user_data.get('admission_no', '')
         
+        if self.draining:
+            self.record_lookup(admission_no, None, {'status': 'draining'}, 0)
+            await update.message.reply_text(messages.RESTARTING, parse_mode='Markdown')
+            context.user_data.clear()
+            return ConversationHandler.END
+        
         # Send processing message
-        processing_msg = await update.message.reply_text(
-            "🔍 *Checking your results...*\n\n⏳ Please wait while I fetch your information from the server.\n\nThis may take a few moments...",
-            parse_mode='Markdown'
-        )
+        processing_msg = await update.message.reply_text(messages.CHECKING, parse_mode='Markdown')
         
+        self.in_flight += 1
+        started = time.monotonic()
+        trace: Dict[str, Any] = {}
         try:
             # Make API request
-            result_data = await self.make_api_request(admission_no, first_name)
+            result_data = await self.make_api_request(admission_no, first_name, trace=trace)
+            self.record_lookup(admission_no, result_data, trace, time.monotonic() - started)
             
             if result_data:
                 await self.send_results(update, result_data)
             else:
-                await update.message.reply_text(
-                    "❌ *Sorry, I couldn't find your results.*\n\n"
-                    "This could be because:\n"
-                    "• The admission number or name is incorrect\n"
-                    "• The server is currently busy\n"
-                    "• Your results are not yet available\n\n"
-                    "💡 *Try again:* Send /check to start over",
-                    parse_mode='Markdown'
-                )
+                await update.message.reply_text(messages.NOT_FOUND, parse_mode='Markdown')
         
         except Exception as e:
             logger.error(f"Error processing request: {e}")
-            await update.message.reply_text(
-                "❌ *An error occurred while checking your results.*\n\n"
-                "Please try again later or contact support.\n\n"
-                "💡 *Try again:* Send /check to start over",
-                parse_mode='Markdown'
-            )
+            await update.message.reply_text(messages.LOOKUP_ERROR, parse_mode='Markdown')
+        finally:
+            self.in_flight -= 1
         
         # Clear user data
         context.user_data.clear()
         return ConversationHandler.END
     
-    async def make_api_request(self, admission_no: str, first_name: str, max_retries: int = 3) -> Optional[Dict[Any, Any]]:
-        """Make API request with retry mechanism"""
-        
-        for attempt in range(max_retries):
-            try:
-                # Random delay to avoid overwhelming the server
-                if attempt > 0:
-                    delay = min(2 ** attempt + random.uniform(0, 1), 10)
-                    time.sleep(delay)
-                
-                # Rotate user agent
-                user_agent = random.choice(USER_AGENTS)
-                
-                # Request payload
-                payload = {
-                    "admissionNo": admission_no,
-                    "firstName": first_name,
-                    "turnstileToken": ""
-                }
-                
-                # Headers
-                headers = {
-                    "Content-Type": "application/json",
-                    "User-Agent": user_agent,
-                    "Accept": "application/json, text/plain, */*",
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "Connection": "keep-alive",
-                    "Referer": "https://eaes.et/",
-                    "Origin": "https://eaes.et"
-                }
-                
-                # Send POST request
-                response = requests.post(
-                    API_URL, 
-                    json=payload, 
-                    headers=headers, 
-                    timeout=30,
-                    allow_redirects=True
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 429:  # Too Many Requests
-                    time.sleep(5 + random.uniform(0, 3))
-                elif response.status_code == 503:  # Service Unavailable
-                    time.sleep(3 + random.uniform(0, 2))
-                    
-            except requests.exceptions.Timeout:
-                logger.warning(f"Request timeout (attempt {attempt + 1})")
-            except requests.exceptions.ConnectionError:
-                logger.warning(f"Connection error (attempt {attempt + 1})")
-            except Exception as e:
-                logger.error(f"Request error: {e}")
-        
-        return None
+    async def make_api_request(self, admission_no: str, first_name: str, max_retries: int = 3,
+                               trace: Optional[Dict[str, Any]] = None) -> Optional[Dict[Any, Any]]:
+        """Look up results through the priority lanes, filling trace with the outcome if given"""
+        return await self.lanes.lookup(admission_no, first_name, trace=trace, max_retries=max_retries)
+    
+    def record_lookup(self, admission_no: str, data: Optional[Dict[Any, Any]], trace: Dict[str, Any], latency: float) -> None:
+        """Append the lookup outcome to the event log"""
+        if self.event_log is None:
+            return
+        # Scores come from upstream fetches only, so each student counts once in pass rates
+        total = messages.result_total(data.get('results', [])) if data and not trace.get('cache_hit') else None
+        self.event_log.record(
+            admission_no,
+            trace.get('status', 'error'),
+            latency,
+            cache_hit=trace.get('cache_hit', False),
+            retries=trace.get('retries', 0),
+            total=total,
+            source='bot'
+        )
     
     async def send_results(self, update: Update, data: Dict[Any, Any]) -> None:
         """Send formatted results to user"""
         student = data.get('studentInfo', {})
         results = data.get('results', [])
         
-        # Student information
-        student_info = f"""
-👨‍🎓 *STUDENT INFORMATION*
-
-📝 **Name:** {student.get('FullName', 'N/A')}
-🎓 **Admission No:** {student.get('Admission_No', 'N/A')}
-👤 **Gender:** {student.get('Sex', 'N/A')}
-🏫 **School:** {student.get('School', 'N/A')}
-📚 **Stream:** {student.get('Stream', 'N/A')}
-        """
-        
-        await update.message.reply_text(student_info, parse_mode='Markdown')
-        
-        # Display subject results and get total from last item
-        total_result = 0
-        if results:
-            results_text = "📊 *SUBJECT RESULTS*\n\n"
-            for result in results:
-                subject = result.get('Subject', 'N/A')
-                grade = result.get('Result', 'N/A')
-                results_text += f"📖 **{subject}:** {grade}\n"
-            
-            # Get total result from the last item in the array
-            if results:
-                last_result = results[-1]
-                total_grade = last_result.get('Result', 'N/A')
-                
-                # Try to convert the last result to number for comparison
-                try:
-                    if isinstance(total_grade, (int, float)):
-                        total_result = total_grade
-                    elif isinstance(total_grade, str) and total_grade.replace('.', '').isdigit():
-                        total_result = float(total_grade)
-                except (ValueError, TypeError):
-                    total_result = 0
-                
-                results_text += f"\n🎯 **Total Result:** {total_grade}"
-            
-            await update.message.reply_text(results_text, parse_mode='Markdown')
-        else:
-            await update.message.reply_text("📊 *No subject results found.*", parse_mode='Markdown')
+        await update.message.reply_text(messages.render_student_info(student), parse_mode='Markdown')
+        await update.message.reply_text(messages.render_results(results), parse_mode='Markdown')
         
         # Send appropriate GIF based on total result
-        await self.send_result_gif(update, total_result)
-        
-        # Success message with options
-        keyboard = [
-            [InlineKeyboardButton("🔍 Check Another Result", callback_data="start_check")],
-            [InlineKeyboardButton("❓ Help", callback_data="help")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        await self.send_result_gif(update, messages.result_total(results))
         
         await update.message.reply_text(
-            "✅ *Results retrieved successfully!*\n\n"
-            "Need to check another result? Use the button below:",
+            messages.RESULTS_DONE,
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=messages.RESULTS_KEYBOARD
         )
     
     async def send_result_gif(self, update: Update, total_result: float) -> None:
         """Send appropriate GIF based on total result"""
+        passed = total_result > messages.PASS_MARK
+        gif_path = messages.PASS_GIF if passed else messages.FAIL_GIF
+        message = messages.PASS_MESSAGE if passed else messages.FAIL_MESSAGE
+        
         try:
-            if total_result > 300:
-                # Send celebration GIF for passing
-                gif_path = "assets/tom-and-jerry-throwing-flowers-celebration-dance.gif"
-                message = "🎉 *Congratulations! You passed!* 🎉\n\nYour hard work paid off!"
-                
-                with open(gif_path, 'rb') as gif_file:
-                    await update.message.reply_animation(
-                        animation=gif_file,
-                        caption=message,
-                        parse_mode='Markdown'
-                    )
-            else:
-                # Send sad GIF for not passing
-                gif_path = "assets/sushichaeng-tom-and-jerry.gif"
-                message = "😔 *You didn't pass this time*\n\nDon't give up! You can try again next time. Keep studying and you'll succeed! 💪"
-                
-                with open(gif_path, 'rb') as gif_file:
-                    await update.message.reply_animation(
-                        animation=gif_file,
-                        caption=message,
-                        parse_mode='Markdown'
-                    )
+            await self.reply_gif(update, gif_path, message)
         except FileNotFoundError as e:
             logger.error(f"GIF file not found: {e}")
             # Fallback message if GIF files are not found
-            if total_result > 300:
-                await update.message.reply_text(
-                    "🎉 *Congratulations! You passed!* 🎉\n\nYour hard work paid off!",
-                    parse_mode='Markdown'
-                )
-            else:
-                await update.message.reply_text(
-                    "😔 *You didn't pass this time*\n\nDon't give up! You can try again next time. Keep studying and you'll succeed! 💪",
-                    parse_mode='Markdown'
-                )
+            await update.message.reply_text(message, parse_mode='Markdown')
         except Exception as e:
             logger.error(f"Error sending GIF: {e}")
             # Fallback message if there's any error
-            if total_result > 300:
-                await update.message.reply_text(
-                    "🎉 *Congratulations! You passed!* 🎉\n\nYour hard work paid off!",
-                    parse_mode='Markdown'
-                )
-            else:
-                await update.message.reply_text(
-                    "😔 *You didn't pass this time*\n\nDon't give up! You can try again next time. Keep studying and you'll succeed! 💪",
-                    parse_mode='Markdown'
-                )
+            await update.message.reply_text(message, parse_mode='Markdown')
+    
+    async def reply_gif(self, update: Update, gif_path: str, caption: str) -> None:
+        """Send a GIF, uploading it only the first time and reusing its file id afterwards"""
+        file_id = self.media_ids.get(gif_path)
+        if file_id:
+            await update.message.reply_animation(animation=file_id, caption=caption, parse_mode='Markdown')
+            return
+        
+        with open(gif_path, 'rb') as gif_file:
+            sent = await update.message.reply_animation(
+                animation=gif_file,
+                caption=caption,
+                parse_mode='Markdown'
+            )
+        if sent.animation:
+            self.media_ids[gif_path] = sent.animation.file_id
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Send help information"""
-        help_text = """
-❓ *How to Use Grade 12 Results Checker*
-
-🔍 *To check your results:*
-1. Send /check or click "Check Results"
-2. Enter your admission number
-3. Enter your first name
-4. Wait for your results!
-
-📋 *Commands:*
-• /start - Welcome message
-• /check - Start checking results
-• /help - Show this help message
-• /cancel - Cancel current operation
-
-💡 *Tips:*
-• Make sure your admission number and name are correct
-• Use the same spelling as in your official documents
-• If results aren't found, double-check your information
-
-🆘 *Need more help?*
-Contact the bot administrator for assistance.
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Check Results", callback_data="start_check")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await update.message.reply_text(
-            help_text, 
+            messages.HELP_TEXT, 
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=messages.HELP_KEYBOARD
         )
     
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Cancel the current operation"""
         context.user_data.clear()
-        await update.message.reply_text(
-            "❌ *Operation cancelled.*\n\n"
-            "Send /check to start checking results again.",
-            parse_mode='Markdown'
-        )
+        await update.message.reply_text(messages.CANCELLED, parse_mode='Markdown')
         return ConversationHandler.END
     
     async def start_check_from_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -403,17 +243,7 @@ Contact the bot administrator for assistance.
         await query.answer()
         
         # Send the same message as start_check_command but as a reply to the button
-        message = """
-📝 *Step 1 of 2: Admission Number*
-
-Please send me your **admission number**.
-
-💡 *Tip:* This is the number you received when you registered for the exam.
-
-Example: 1234567890
-        """
-        
-        await query.message.reply_text(message, parse_mode='Markdown')
+        await query.message.reply_text(messages.ADMISSION_PROMPT, parse_mode='Markdown')
         return WAITING_FOR_ADMISSION
     
     async def help_from_button(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -421,45 +251,52 @@ Example: 1234567890
         query = update.callback_query
         await query.answer()
         
-        help_text = """
-❓ *How to Use Grade 12 Results Checker*
-
-🔍 *To check your results:*
-1. Send /check or click "Check Results"
-2. Enter your admission number
-3. Enter your first name
-4. Wait for your results!
-
-📋 *Commands:*
-• /start - Welcome message
-• /check - Start checking results
-• /help - Show this help message
-• /cancel - Cancel current operation
-
-💡 *Tips:*
-• Make sure your admission number and name are correct
-• Use the same spelling as in your official documents
-• If results aren't found, double-check your information
-
-🆘 *Need more help?*
-Contact the bot administrator for assistance.
-        """
-        
-        keyboard = [
-            [InlineKeyboardButton("🔍 Check Results", callback_data="start_check")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await query.message.reply_text(
-            help_text, 
+            messages.HELP_TEXT, 
             parse_mode='Markdown',
-            reply_markup=reply_markup
+            reply_markup=messages.HELP_KEYBOARD
         )
     
+    def request_shutdown(self) -> None:
+        """Drain in-flight lookups, save warm state and stop polling; safe to call from any thread"""
+        self.stop_requested = True
+        loop = self.loop
+        # Before post_init there is no loop yet, and post_init starts the shutdown itself
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._start_shutdown)
+    
+    def _start_shutdown(self) -> None:
+        if self.shutdown_task is None:
+            self.shutdown_task = self.loop.create_task(self.shutdown_gracefully())
+    
+    async def shutdown_gracefully(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Stop taking new lookups, wait for in-flight ones, then stop the bot"""
+        self.draining = True
+        logger.info(f"Draining {self.in_flight} in-flight lookups...")
+        
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.in_flight:
+            logger.warning(f"Drain deadline reached with {self.in_flight} lookups still running")
+        
+        try:
+            save_snapshot(self.result_cache, self.media_ids)
+        except Exception as e:
+            logger.error(f"Could not save state snapshot: {e}")
+        
+        # stop_running does nothing until polling has started, which a stop during start-up precedes
+        while not self.application.running:
+            await asyncio.sleep(0.1)
+        self.application.stop_running()
+    
     def run(self):
         """Start the bot"""
         logger.info("Starting Grade 12 Results Bot...")
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+        self.media_ids.update(load_snapshot(self.result_cache))
+        # Stop signals are handled in post_init so lookups can drain first
+        self.application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
 
 def main():
     """Main function"""
@@ -479,6 +316,7 @@ def main():
     # Create and run bot
     bot = Grade12ResultBot(bot_token)
     bot.run()
+    close_event_log()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test the multi-student CLI engine against a local fake results server
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import tempfile
+import subprocess
+from aiohttp import web
+from cli_engine import CliEngine, RateLimiter
+from result_cache import ResultCache
+from upstream import UpstreamPool
+
+async def start_fake_server(calls):
+    async def handler(request):
+        body = await request.json()
+        calls.append(body['admissionNo'])
+        await asyncio.sleep(0.05)
+        if body['firstName'] == 'unknown':
+            return web.Response(status=404)
+        return web.json_response({
+            "studentInfo": {"FullName": body['firstName'].title()},
+            "results": [{"Subject": "Total", "Result": "350"}],
+        })
+
+    app = web.Application()
+    app.router.add_post('/api', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api"
+
+def test_rate_limiter():
+    """Requests beyond the burst are spaced out to the configured rate"""
+    async def run():
+        limiter = RateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.15
+
+def test_parallel_lookups():
+    """Queued students are looked up concurrently and duplicates are fetched once"""
+    async def run():
+        calls = []
+        runner, url = await start_fake_server(calls)
+        try:
+            engine = CliEngine(concurrency=3, rate=100, max_retries=1, live=False)
+            engine.pool = UpstreamPool([url])
+            engine.cache = ResultCache()
+            engine.event_log = None
+            engine.print_report = lambda: None
+            await engine.run(["1 abebe", "2 almaz", "3 unknown", "1 Abebe"])
+        finally:
+            await runner.cleanup()
+        return engine, calls
+
+    engine, calls = asyncio.run(run())
+    assert [lookup.status for lookup in engine.lookups] == ['found', 'found', 'failed', 'found']
+    assert engine.lookups[3].cache_hit
+    assert sorted(calls) == ['1', '2', '3']
+
+def test_ctrl_c_while_waiting_for_input():
+    """Ctrl+C exits straight away even though stdin is still open"""
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, EVENT_LOG_DIR=directory)
+        process = subprocess.Popen(
+            [sys.executable, 'get_grade_12_result.py', '--multi', '--no-live'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        try:
+            time.sleep(3)
+            process.send_signal(signal.SIGINT)
+            # wait() rather than communicate(), which would close stdin and end the read itself
+            process.wait(timeout=5)
+            output = process.stdout.read()
+        finally:
+            process.kill()
+            process.stdin.close()
+            process.stdout.close()
+    assert "Operation cancelled by user." in output
+
+if __name__ == '__main__':
+    test_rate_limiter()
+    test_parallel_lookups()
+    test_ctrl_c_while_waiting_for_input()
+    print("✅ All CLI engine tests passed!")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test the lookup event log, its rollups and the hourly stats
+"""
+
+import os
+import glob
+import time
+import tempfile
+import event_log
+from event_log import EventLog, compact, load_events, hourly_stats
+
+def write_events(directory):
+    log = EventLog(directory, fsync_interval=0.05)
+    log.record("1234567890", "found", 0.2, retries=1, total=420)
+    log.record("1234567890", "found", 0.01, cache_hit=True)
+    log.record("2222222222", "found", 0.4, total=250)
+    log.record("3333333333", "timeout", 30.0, retries=2)
+    log.record("4444444444", "rate_limited", 1.5, retries=2, source='web')
+    log.close()
+
+def test_events_are_written():
+    """Events reach disk as fixed-size records without the admission number"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_events(tmp)
+        segments = glob.glob(os.path.join(tmp, "events-*.bin"))
+        assert len(segments) == 1
+        with open(segments[0], 'rb') as f:
+            data = f.read()
+        assert len(data) == 5 * event_log.RECORD.size
+        assert b"1234567890" not in data
+
+def test_rollup_and_stats():
+    """Closed segments are rolled up and aggregated per hour"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_events(tmp)
+        assert compact(tmp, now=time.time() + 2 * 3600) == 1
+        assert not glob.glob(os.path.join(tmp, "events-*.bin"))
+        assert len(glob.glob(os.path.join(tmp, "rollup-*.col"))) == 1
+
+        rows = hourly_stats(load_events(tmp))
+        assert sum(row['lookups'] for row in rows) == 5
+        row = rows[-1]
+        assert row['status'] == {'found': 3, 'timeout': 1, 'rate_limited': 1}
+        assert row['cache_hit_rate'] == 0.2
+        assert row['pass_rate'] == 0.5
+
+def test_open_segment_not_compacted():
+    """The segment for the current hour is left alone"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_events(tmp)
+        assert compact(tmp) == 0
+        assert sum(row['lookups'] for row in hourly_stats(load_events(tmp))) == 5
+
+def test_salt_kept_in_log_directory():
+    """Without EVENT_LOG_SALT a random key is created once and shared by every writer"""
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as other:
+        first, second = EventLog(tmp), EventLog(tmp)
+        elsewhere = EventLog(other)
+        try:
+            assert first.salt == second.salt and len(first.salt) == 32
+            assert os.path.exists(os.path.join(tmp, event_log.SALT_FILE))
+            assert elsewhere.salt != first.salt
+        finally:
+            first.close()
+            second.close()
+            elsewhere.close()
+
+def pure_python_stats(directory):
+    saved = event_log.numpy
+    event_log.numpy = None
+    try:
+        return hourly_stats(load_events(directory))
+    finally:
+        event_log.numpy = saved
+
+def test_numpy_and_pure_python_agree():
+    """Live segments and rollups give the same stats with and without numpy"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_events(tmp)
+        if event_log.numpy is not None:
+            assert isinstance(load_events(tmp)['ts'], event_log.numpy.ndarray)
+        live = hourly_stats(load_events(tmp))
+        assert pure_python_stats(tmp) == live
+
+        compact(tmp, now=time.time() + 2 * 3600)
+        assert hourly_stats(load_events(tmp)) == live
+        assert pure_python_stats(tmp) == live
+
+def test_web_cache_hits_not_scored():
+    """Web lookups answered from a shared fetch or the cache carry no total, so students count once"""
+    from app import record_web_lookup
+    recorded = []
+
+    class StubLog:
+        def record(self, admission_no, status, latency, **kwargs):
+            recorded.append(kwargs['total'])
+
+    data = {"results": [{"Subject": "Total", "Result": "350"}]}
+    app = {'event_log': StubLog()}
+    record_web_lookup(app, "1", {'status': 'found', 'cache_hit': False}, time.monotonic(), data)
+    record_web_lookup(app, "1", {'status': 'found', 'cache_hit': True}, time.monotonic(), data)
+    assert recorded == [350, None]
+
+if __name__ == '__main__':
+    test_events_are_written()
+    test_rollup_and_stats()
+    test_open_segment_not_compacted()
+    test_salt_kept_in_log_directory()
+    test_numpy_and_pure_python_agree()
+    test_web_cache_hits_not_scored()
+    print("✅ All event log tests passed!")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test compressed and conditional responses from the web front end
+"""
+
+import gzip
+import asyncio
+from aiohttp.test_utils import TestServer, TestClient
+from app import create_web_app
+from result_cache import ResultCache, cache_key
+from http_cache import accepted_encodings, etag_matches, brotli
+
+RESULT = {
+    "studentInfo": {"FullName": "Abebe Kebede", "Admission_No": "1001", "School": "Addis Ababa Secondary"},
+    "results": [{"Subject": f"Subject {n}", "Result": str(50 + n)} for n in range(12)],
+}
+
+def run_client(test):
+    async def run():
+        app = create_web_app()
+        app['event_log'] = None
+        app['result_cache'] = ResultCache()
+        app['result_cache'].put(cache_key('1001', 'abebe'), RESULT)
+        async with TestClient(TestServer(app)) as client:
+            await test(client)
+    asyncio.run(run())
+
+def test_header_parsing():
+    """Accept-Encoding q-values and weak ETag comparison"""
+    assert accepted_encodings("gzip;q=0.5, br, identity;q=0") == {'gzip': 0.5, 'br': 1.0, 'identity': 0.0}
+    assert etag_matches('"abc", W/"def"', 'W/"def"')
+    assert etag_matches('W/"abc"', 'W/"abc"') and etag_matches('*', 'W/"abc"')
+    assert not etag_matches('"abd"', 'W/"abc"')
+
+def test_page_compressed_and_revalidated():
+    """The page is sent pre-compressed with validators and revalidates to a 304"""
+    async def test(client):
+        plain = await client.get('/results', headers={'Accept-Encoding': 'identity'})
+        page = await plain.read()
+        assert 'Content-Encoding' not in plain.headers
+
+        response = await client.get('/results', headers={'Accept-Encoding': 'gzip'}, auto_decompress=False)
+        compressed = await response.read()
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(compressed) == page
+        assert len(compressed) < len(page) / 2
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+        if brotli is not None:
+            response = await client.get('/results', headers={'Accept-Encoding': 'gzip, br'}, auto_decompress=False)
+            assert response.headers['Content-Encoding'] == 'br'
+            assert brotli.decompress(await response.read()) == page
+
+        etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+        assert (await client.get('/results', headers={'If-None-Match': etag})).status == 304
+        assert (await client.get('/results', headers={'If-Modified-Since': last_modified})).status == 304
+        assert (await client.get('/results', headers={'If-None-Match': 'W/"other"'})).status == 200
+
+        assert (await client.get('/assets/missing.gif')).status == 404
+
+    run_client(test)
+
+def test_check_results_etag():
+    """Results carry a private ETag, and a repeat check with it gets an empty 304"""
+    async def test(client):
+        request = {'admissionNo': '1001', 'firstName': 'Abebe'}
+        response = await client.post('/check_results', json=request, headers={'Accept-Encoding': 'gzip'})
+        body = await response.json()
+        assert body == {'success': True, 'data': RESULT}
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Cache-Control'] == 'private, max-age=300'
+
+        repeat = await client.post('/check_results', json=request, headers={'If-None-Match': response.headers['ETag']})
+        assert repeat.status == 304
+        assert await repeat.read() == b''
+
+        invalid = await client.post('/check_results', json={})
+        assert invalid.status == 400
+        assert invalid.headers['Cache-Control'] == 'no-store'
+
+    run_client(test)
+
+if __name__ == '__main__':
+    test_header_parsing()
+    test_page_compressed_and_revalidated()
+    test_check_results_etag()
+    print("✅ All HTTP cache tests passed!")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the priority lanes used for bot and web lookups
+"""
+
+import time
+import asyncio
+import threading
+import lanes
+from lanes import LookupLanes
+from result_cache import ResultCache, cache_key
+
+RESULT = {"studentInfo": {"FullName": "Abebe"}, "results": [{"Subject": "Total", "Result": "350"}]}
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+    def json(self):
+        return RESULT
+
+class FakePool:
+    def __init__(self, statuses, delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.calls = []
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def post(self, json=None, **kwargs):
+        with self._lock:
+            self.calls.append(json['admissionNo'])
+            self.threads.add(threading.current_thread().name)
+            status = self.statuses.pop(0) if self.statuses else 200
+        time.sleep(self.delay)
+        return FakeResponse(status)
+
+def make_lanes(pool, upstream_workers=2, retry_workers=1):
+    result_lanes = LookupLanes(cache=ResultCache(), upstream_workers=upstream_workers, retry_workers=retry_workers)
+    result_lanes.pool = pool
+    return result_lanes
+
+def test_cache_hit_not_blocked_by_slow_upstream():
+    """Cached students are answered while every upstream worker is busy"""
+    async def run():
+        result_lanes = make_lanes(FakePool([], delay=0.5), upstream_workers=1)
+        result_lanes.cache.put(cache_key('9', 'almaz'), RESULT)
+        misses = [asyncio.create_task(result_lanes.lookup(str(n), 'abebe')) for n in range(3)]
+        await asyncio.sleep(0.05)
+
+        started = time.monotonic()
+        trace = {}
+        data = await result_lanes.lookup('9', 'Almaz', trace)
+        hit_latency = time.monotonic() - started
+        stats = {lane['lane']: lane for lane in result_lanes.stats()}
+        await asyncio.gather(*misses)
+        return data, trace, hit_latency, stats
+
+    data, trace, hit_latency, stats = asyncio.run(run())
+    assert data == RESULT and trace['cache_hit']
+    assert hit_latency < 0.1
+    assert stats['fast']['completed'] == 1
+    assert stats['upstream']['running'] == 1 and stats['upstream']['queued'] == 2
+
+def test_retries_use_retry_lane():
+    """Failed attempts are retried on the retry lane, and only a 404 "not found" is not retried"""
+    async def run():
+        pool = FakePool([503, 429, 200])
+        result_lanes = make_lanes(pool)
+        trace = {}
+        data = await result_lanes.lookup('1', 'abebe', trace)
+        again = await result_lanes.lookup('1', 'abebe')
+
+        missing = make_lanes(FakePool([404]))
+        missing_trace = {}
+        await missing.lookup('2', 'nobody', missing_trace)
+
+        rejected = make_lanes(FakePool([403]))
+        rejected_trace = {}
+        await rejected.lookup('3', 'abebe', rejected_trace)
+        return data, again, trace, pool, result_lanes.stats(), missing_trace, missing.pool, rejected_trace
+
+    retry_delay = lanes.retry_delay
+    lanes.retry_delay = lambda attempt, status: 0.01
+    try:
+        data, again, trace, pool, stats, missing_trace, missing_pool, rejected_trace = asyncio.run(run())
+    finally:
+        lanes.retry_delay = retry_delay
+    assert data == RESULT and again == RESULT
+    assert trace == {'status': 'found', 'retries': 2, 'cache_hit': False}
+    assert len(pool.calls) == 3
+    assert any(name.startswith('lane-upstream') for name in pool.threads)
+    assert any(name.startswith('lane-retry') for name in pool.threads)
+    assert [lane['completed'] for lane in stats] == [1, 1, 2]
+    assert missing_trace['status'] == 'not_found' and missing_trace['retries'] == 0
+    assert len(missing_pool.calls) == 1
+    assert rejected_trace == {'status': 'found', 'retries': 1, 'cache_hit': False}
+
+def test_duplicate_misses_fetched_once():
+    """Concurrent lookups of the same student share one upstream request"""
+    async def run():
+        pool = FakePool([], delay=0.1)
+        result_lanes = make_lanes(pool)
+        results = await asyncio.gather(*(result_lanes.lookup('1', 'abebe') for _ in range(4)))
+        return results, pool
+
+    results, pool = asyncio.run(run())
+    assert all(data == RESULT for data in results)
+    assert pool.calls == ['1']
+
+if __name__ == '__main__':
+    test_cache_hit_not_blocked_by_slow_upstream()
+    test_retries_use_retry_lane()
+    test_duplicate_misses_fetched_once()
+    print("✅ All lane tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test message rendering and Markdown escaping
+"""
+
+import messages
+
+SAMPLE = {
+    "studentInfo": {
+        "FullName": "Abebe_Kebede *Tesfaye*",
+        "Admission_No": "1234567890",
+        "Sex": "M",
+        "School": "Menelik [II] School",
+    },
+    "results": [
+        {"Subject": "Math", "Result": "85"},
+        {"Subject": "English_1", "Result": "78"},
+        {"Subject": "Total", "Result": "343"},
+    ],
+}
+
+def test_escape_markdown():
+    """Markdown control characters are escaped"""
+    assert messages.escape_markdown("a_b*c`d[e") == "a\\_b\\*c\\`d\\[e"
+    assert messages.escape_markdown(42) == "42"
+
+def test_student_info():
+    """Names with Markdown characters are shown literally, missing fields become N/A"""
+    text = messages.render_student_info(SAMPLE["studentInfo"])
+    assert "Abebe\\_Kebede \\*Tesfaye\\*" in text
+    assert "Menelik \\[II] School" in text
+    assert "**Stream:** N/A" in text
+
+def test_results():
+    """Every subject is listed and the last result is the total"""
+    text = messages.render_results(SAMPLE["results"])
+    assert "📖 **English\\_1:** 78" in text
+    assert text.endswith("🎯 **Total Result:** 343")
+    assert messages.render_results([]) == messages.NO_RESULTS
+
+def test_escaping_only_when_needed():
+    """Plain values are rendered as they are; a lone asterisk in a value is still escaped"""
+    assert "📖 **Math:** 85\n" in messages.render_results(SAMPLE["results"][:1])
+    assert "📖 **Art:** A\\*\n" in messages.render_results([{"Subject": "Art", "Result": "A*"}])
+    assert "**Name:** Abebe*" not in messages.render_student_info({"FullName": "Abebe*"})
+
+def test_result_total():
+    """The total is read from the last result"""
+    assert messages.result_total(SAMPLE["results"]) == 343
+    assert messages.result_total([{"Result": 301.5}]) == 301.5
+    assert messages.result_total([{"Result": "N/A"}]) == 0
+    assert messages.result_total([]) == 0
+
+def test_name_prompt():
+    """The admission number typed by the user is escaped"""
+    assert "Received:* 12_34" not in messages.render_name_prompt("12_34")
+    assert "Received:* 12\\_34" in messages.render_name_prompt("12_34")
+
+if __name__ == '__main__':
+    test_escape_markdown()
+    test_student_info()
+    test_results()
+    test_escaping_only_when_needed()
+    test_result_total()
+    test_name_prompt()
+    print("✅ All message tests passed!")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test the sampling profiler and the event loop watchdog
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import threading
+from profiling import sample_profile, watch_loop, profile_to_file
+
+def busy_wait(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_collapsed_stacks():
+    """Every line is a semicolon-separated stack followed by a sample count"""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,), name="busy")
+    worker.start()
+    try:
+        stacks = sample_profile(0.2)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = stacks.splitlines()
+    assert any(line.startswith("busy;") and "busy_wait (test_profiling.py" in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+
+def test_watchdog_reports_stall():
+    """Blocking the loop past the threshold is reported once"""
+    async def run():
+        watchdog = watch_loop("test", threshold=0.05)
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        watchdog.stop()
+        return watchdog.stalls
+
+    assert asyncio.run(run()) == 1
+
+def test_profile_to_file():
+    """A profile of a process without HTTP is written to a folded-stacks file"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = profile_to_file(0.1, directory)
+        assert os.path.dirname(path) == directory and path.endswith(".folded")
+        with open(path, encoding="utf-8") as f:
+            assert f.read().strip()
+
+if __name__ == '__main__':
+    test_collapsed_stacks()
+    test_watchdog_reports_stall()
+    test_profile_to_file()
+    print("✅ All profiling tests passed!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the result cache shared between web workers
+"""
+
+import os
+import tempfile
+from result_cache import ResultCache, cache_key
+
+def test_cache_key():
+    """Keys ignore surrounding spaces and name case"""
+    assert cache_key(" 123 ", "Abebe") == cache_key("123", "abebe ")
+
+def test_memory_cache():
+    """Results are returned until they expire"""
+    cache = ResultCache()
+    cache.put("1:a", {"results": [{"Subject": "Math", "Result": "85"}]})
+    assert cache.get("1:a")["results"][0]["Result"] == "85"
+    assert cache.get("2:b") is None
+
+    cache.put("3:c", {"results": []}, ttl=-1)
+    assert cache.get("3:c") is None
+
+def test_shared_cache():
+    """A result stored by one process is visible to another"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        writer = ResultCache(path)
+        reader = ResultCache(path)
+        body = writer.put("1:a", {"studentInfo": {"FullName": "Abebe Kebede"}})
+        assert reader.get_json("1:a") == body
+        writer.close()
+        reader.close()
+
+def test_eviction():
+    """Only the most recently used entries are kept in memory"""
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {})
+    assert cache.get("a") is None
+    assert len(cache) == 2
+
+def test_shared_file_pruned():
+    """Expired rows are deleted from the shared file and it stays under max_rows"""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = ResultCache(os.path.join(directory, "cache.sqlite3"), max_rows=3)
+        cache.put("old", {}, ttl=-1)
+        for key in ("a", "b", "c", "d"):
+            cache._pruned_at = 0
+            cache.put(key, {})
+        rows = [row[0] for row in cache._db.execute("SELECT key FROM results ORDER BY key")]
+        assert rows == ["b", "c", "d"]
+        cache.close()
+
+def test_items_include_shared_rows():
+    """Results fetched by other processes are part of a snapshot taken from this one"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.sqlite3")
+        worker, master = ResultCache(path), ResultCache(path)
+        worker.put("fetched", {"n": 1})
+        master.put("local", {"n": 2})
+        assert [key for key, _, _ in master.items()] == ["fetched", "local"]
+        worker.close()
+        master.close()
+
+if __name__ == '__main__':
+    test_cache_key()
+    test_memory_cache()
+    test_shared_cache()
+    test_eviction()
+    test_shared_file_pruned()
+    test_items_include_shared_rows()
+    print("✅ All cache tests passed!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test the soak runner's fake upstream and its leak and retry storm checks
+"""
+
+import time
+import asyncio
+import requests
+import lanes
+import upstream
+from soak import start_fake_upstream, set_weights, evaluate, SoakRunner
+
+def sample(phase, t, rss=50.0, fds=12, threads=9, lag=2.0, lookups=8.0, upstream_s=8.0, rejected=0.0,
+           upstream_total=100, lookups_total=100):
+    return {'t': t, 'phase': phase, 'rss_mb': rss, 'fds': fds, 'threads': threads, 'loop_lag_ms': lag,
+            'lookups_s': lookups, 'found_pct': 100.0, 'upstream_s': upstream_s, 'rejected_pct': rejected,
+            'upstream_total': upstream_total, 'lookups_total': lookups_total}
+
+def test_fake_upstream_behaviours():
+    """Each scripted behaviour shows up to the client as the failure it imitates"""
+    process, url, weights, counts = start_fake_upstream(drip_seconds=1)
+    try:
+        def post(behaviour, timeout=5):
+            set_weights(weights, {behaviour: 1.0})
+            return requests.post(url, json={'admissionNo': '1', 'firstName': 'soak'}, timeout=timeout)
+
+        assert post('ok').json()['studentInfo']['FullName'] == 'soak'
+        assert post('rate_limited').status_code == 429
+
+        started = time.monotonic()
+        assert post('drip').status_code == 200
+        assert time.monotonic() - started >= 0.8
+
+        try:
+            post('reset')
+            assert False, "reset should fail"
+        except requests.exceptions.ConnectionError:
+            pass
+        try:
+            post('half_open', timeout=(1, 0.3))
+            assert False, "half-open should time out"
+        except requests.exceptions.ReadTimeout:
+            pass
+        assert list(counts) == [1, 1, 1, 1, 1]
+    finally:
+        process.terminate()
+        process.join(5)
+
+def test_evaluate():
+    """Leaks, blocked loops and retry storms fail the run, a clean run passes"""
+    clean = [sample('baseline', t) for t in range(4)] + [sample('resets', 4 + t, rejected=40.0) for t in range(4)]
+    clean += [sample('recovery', 8 + t) for t in range(4)]
+    assert evaluate(clean, clients=8) == []
+
+    leaky = clean[:8] + [sample('recovery', 8 + t, rss=120.0, fds=60) for t in range(4)]
+    failures = evaluate(leaky, clients=8)
+    assert any('Memory leak' in f for f in failures) and any('descriptor' in f for f in failures)
+
+    stormy = clean[:4] + [sample('rising-429', 4, rejected=95.0, upstream_s=40.0)] + clean[8:]
+    assert any('Retry storm' in f for f in evaluate(stormy, clients=8))
+
+    amplified = clean[:-1] + [sample('recovery', 11, upstream_total=1000, lookups_total=100)]
+    assert any('amplification' in f for f in evaluate(amplified, clients=8))
+
+    blocked = clean[:-1] + [sample('recovery', 11, lag=900.0)]
+    assert any('blocked' in f for f in evaluate(blocked, clients=8))
+
+    assert 'too short' in evaluate(clean[:4], clients=8)[0]
+
+def test_short_soak():
+    """A few seconds of soak exercise both retry paths and produce samples for every phase"""
+    saved_pool, saved_lanes = upstream._pool, lanes._lanes
+    runner = SoakRunner(hours=8 / 3600, scenarios=('resets',), threads=1, tasks=1, think=0.05,
+                        sample_interval=0.25, read_timeout=1, quiet=True)
+    samples = asyncio.run(runner.run())
+    assert {s['phase'] for s in samples} == {'baseline', 'resets', 'recovery'}
+    assert runner.completed['retry'][0] > 0 and runner.completed['bot'][0] > 0
+    assert samples[-1]['upstream_total'] >= samples[-1]['lookups_total']
+    # Nothing is left pointing at the stopped fake upstream for later tests
+    assert upstream._pool is saved_pool and lanes._lanes is saved_lanes
+
+if __name__ == '__main__':
+    test_fake_upstream_behaviours()
+    test_evaluate()
+    test_short_soak()
+    print("✅ All soak tests passed!")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test the pre-fork web worker supervisor with stub processes
+"""
+
+import time
+from app import WorkerSupervisor, WebWorker
+
+class StubHeartbeat:
+    def __init__(self, value: float = 0.0):
+        self.value = value
+
+class StubProcess:
+    def __init__(self, ignores_sigterm: bool = False):
+        self.alive = True
+        self.ignores_sigterm = ignores_sigterm
+        self.terminated = False
+        self.killed = False
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+        if not self.ignores_sigterm:
+            self.exit(-15)
+
+    def kill(self):
+        self.killed = True
+        self.exit(-9)
+
+    def exit(self, code):
+        self.alive = False
+        self.exitcode = code
+
+    def join(self, timeout=None):
+        pass
+
+class StubSupervisor(WorkerSupervisor):
+    def __init__(self, workers, ready=True, ignores_sigterm=False, **kwargs):
+        super().__init__(workers, **kwargs)
+        self.ready = ready
+        self.ignores_sigterm = ignores_sigterm
+        self.spawned = []
+
+    def spawn(self, index):
+        worker = WebWorker(index, StubProcess(self.ignores_sigterm), StubHeartbeat(time.time() if self.ready else 0.0))
+        self.spawned.append(worker)
+        return worker
+
+def test_dead_worker_replaced():
+    """A ready worker that exits is replaced straight away"""
+    supervisor = StubSupervisor(2)
+    supervisor.start()
+    first = supervisor.workers[0]
+    first.process.exit(1)
+    supervisor.check()
+    assert supervisor.workers[0] is not first and supervisor.workers[0].process.is_alive()
+    assert supervisor.workers[1] is supervisor.spawned[1]
+    assert supervisor.restarts == 1
+
+def test_missed_heartbeat_does_not_block():
+    """A hung worker is replaced at once and killed on a later pass, not waited for"""
+    supervisor = StubSupervisor(2, ignores_sigterm=True, heartbeat_timeout=5, stop_timeout=0.2)
+    supervisor.start()
+    hung = supervisor.workers[0]
+    hung.heartbeat.value = time.time() - 10
+
+    started = time.monotonic()
+    supervisor.check()
+    assert time.monotonic() - started < 0.1
+    assert hung.process.terminated and hung.process.is_alive()
+    assert supervisor.workers[0] is not hung
+    assert [worker for worker, _ in supervisor.retiring] == [hung]
+
+    supervisor.check()
+    assert not hung.process.killed
+    time.sleep(0.25)
+    supervisor.check()
+    assert hung.process.killed and supervisor.retiring == []
+
+def test_crash_backoff():
+    """A worker that never becomes ready is respawned after a growing delay"""
+    supervisor = StubSupervisor(1, ready=False, heartbeat_timeout=0)
+    supervisor.start()
+    supervisor.workers[0].process.exit(1)
+    supervisor.check()
+    assert supervisor.workers[0] is None and supervisor.crashes[0] == 1
+    first_delay = supervisor.respawn_at[0] - time.time()
+
+    supervisor.check()
+    assert supervisor.workers[0] is None
+    supervisor.respawn_at[0] = time.time()
+    supervisor.check()
+    assert supervisor.workers[0] is supervisor.spawned[-1]
+
+    supervisor.workers[0].process.exit(1)
+    supervisor.check()
+    assert supervisor.crashes[0] == 2
+    assert supervisor.respawn_at[0] - time.time() > first_delay
+
+def test_rolling_restart():
+    """Ready replacements take over; one that never becomes ready leaves the old worker running"""
+    supervisor = StubSupervisor(2, heartbeat_timeout=0.2)
+    supervisor.start()
+    old = list(supervisor.workers)
+    supervisor.rolling_restart()
+    assert all(new is not previous for new, previous in zip(supervisor.workers, old))
+    assert all(worker.process.terminated for worker in old)
+
+    current = list(supervisor.workers)
+    supervisor.ready = False
+    supervisor.rolling_restart()
+    assert supervisor.workers == current
+    assert all(worker.process.is_alive() for worker in current)
+
+def test_stop_kills_retiring_workers():
+    """Stopping the supervisor also finishes workers still retiring"""
+    supervisor = StubSupervisor(1, ignores_sigterm=True, heartbeat_timeout=5, stop_timeout=0)
+    supervisor.start()
+    hung = supervisor.workers[0]
+    hung.heartbeat.value = time.time() - 10
+    supervisor.check()
+    supervisor.stop()
+    assert hung.process.killed and supervisor.workers[0].process.killed
+    assert supervisor.retiring == []
+
+if __name__ == '__main__':
+    test_dead_worker_replaced()
+    test_missed_heartbeat_does_not_block()
+    test_crash_backoff()
+    test_rolling_restart()
+    test_stop_kills_retiring_workers()
+    print("✅ All supervisor tests passed!")
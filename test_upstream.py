@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test upstream endpoint selection and failover
+"""
+
+from upstream import UpstreamPool, failure_reason
+
+def test_prefers_faster_endpoint():
+    """Traffic goes to the endpoint with the lowest latency"""
+    pool = UpstreamPool(["https://a.example", "https://b.example"])
+    a, b = pool.endpoints
+    pool.record_success(a, 2.0)
+    pool.record_success(b, 0.2)
+    assert all(pool.select() is b for _ in range(10))
+
+def test_ejects_failing_endpoint():
+    """An endpoint that keeps failing stops receiving traffic"""
+    pool = UpstreamPool(["https://a.example", "https://b.example"], eject_after=2)
+    a, b = pool.endpoints
+    pool.record_success(a, 0.1)
+    pool.record_success(b, 0.5)
+    pool.record_failure(a, 30.0, "timeout")
+    pool.record_failure(a, 30.0, "timeout")
+    assert all(pool.select() is b for _ in range(10))
+    assert pool.stats()[0]['ejected']
+
+def test_probe_after_ejection():
+    """An ejected endpoint gets one probe once its timeout runs out, and recovers on success"""
+    pool = UpstreamPool(["https://a.example", "https://b.example"], eject_after=1, eject_seconds=0)
+    a, b = pool.endpoints
+    pool.record_success(b, 0.5)
+    pool.record_failure(a, 5.0, "HTTP 503")
+    assert pool.select() is a
+    assert pool.select() is b  # only one probe at a time
+    pool.record_success(a, 0.1)
+    assert not pool.stats()[0]['ejected']
+
+def test_single_endpoint_never_empty():
+    """With every endpoint ejected, requests still go somewhere"""
+    pool = UpstreamPool(["https://a.example"], eject_after=1)
+    pool.record_failure(pool.endpoints[0], 1.0, "connection error")
+    assert pool.select() is pool.endpoints[0]
+
+def test_transient_failure_is_forgiven():
+    """One timeout on the fastest endpoint sidelines it only until the failure decays"""
+    pool = UpstreamPool(["https://a.example", "https://b.example"], error_half_life=10)
+    a, b = pool.endpoints
+    pool.record_success(a, 0.3)
+    pool.record_success(b, 0.1)
+    pool.record_failure(b, 30.0, "timeout")
+    assert pool.stats()[1]['latency_ms'] == 100.0
+    assert pool.select() is a
+    b.error_at -= 60
+    assert all(pool.select() is b for _ in range(10))
+
+def test_never_answered_endpoint_not_preferred():
+    """An endpoint that has only failed does not keep the "unknown, try first" score"""
+    pool = UpstreamPool(["https://a.example", "https://b.example"])
+    a, b = pool.endpoints
+    pool.record_success(b, 0.1)
+    pool.record_failure(a, 5.0, "timeout")
+    pool.record_failure(a, 5.0, "timeout")
+    assert all(pool.select() is b for _ in range(5))
+
+def test_failure_reason():
+    """Only a 404 means the student does not exist"""
+    assert failure_reason(404) == 'not_found'
+    assert failure_reason(429) == 'rate_limited'
+    assert failure_reason(503) == 'server_error'
+    assert failure_reason(400) == 'error' and failure_reason(403) == 'error'
+
+if __name__ == '__main__':
+    test_prefers_faster_endpoint()
+    test_ejects_failing_endpoint()
+    test_probe_after_ejection()
+    test_single_endpoint_never_empty()
+    test_transient_failure_is_forgiven()
+    test_never_answered_endpoint_not_preferred()
+    test_failure_reason()
+    print("✅ All upstream tests passed!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test saving and restoring the warm state snapshot
+"""
+
+import os
+import asyncio
+import tempfile
+from result_cache import ResultCache
+from warm_state import save_snapshot, load_snapshot
+
+def test_snapshot_roundtrip():
+    """Cached results and media ids survive a restart"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        old = ResultCache()
+        old.put("1:a", {"studentInfo": {"FullName": "Abebe Kebede"}})
+        old.put("2:b", {"results": []}, ttl=-1)
+        assert save_snapshot(old, {"assets/pass.gif": "file-id"}, path) == 1
+
+        new = ResultCache()
+        media_ids = load_snapshot(new, path)
+        assert media_ids == {"assets/pass.gif": "file-id"}
+        assert new.get("1:a")["studentInfo"]["FullName"] == "Abebe Kebede"
+        assert new.get("2:b") is None
+
+def test_missing_snapshot():
+    """A first start without a snapshot is not an error"""
+    with tempfile.TemporaryDirectory() as tmp:
+        assert load_snapshot(ResultCache(), os.path.join(tmp, "missing.json")) == {}
+
+def test_stop_before_bot_started():
+    """A SIGTERM that arrives before the bot's loop exists still drains it once it starts"""
+    from telegram_bot import Grade12ResultBot
+    bot = Grade12ResultBot("123:dummy")
+    bot.request_shutdown()
+    assert bot.stop_requested and bot.shutdown_task is None
+
+    async def start():
+        await bot.post_init(bot.application)
+        task = bot.shutdown_task
+        task.cancel()
+        return task
+
+    # Cancelled before it ran, so the test writes no snapshot
+    assert asyncio.run(start()) is not None
+
+if __name__ == '__main__':
+    test_snapshot_roundtrip()
+    test_missing_snapshot()
+    test_stop_before_bot_started()
+    print("✅ All warm state tests passed!")
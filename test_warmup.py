@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the pre-release warm-up job against a local fake results server
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import upstream
+from upstream import UpstreamPool
+from result_cache import ResultCache, cache_key
+from warmup import WarmupJob, load_cohort, read_progress, set_paused, is_paused
+
+class FakeResultsServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeResultsHandler)
+        self.released = False
+        self.calls = []
+        self.fail_once = set()
+
+class FakeResultsHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.calls.append(body['admissionNo'])
+        if body['admissionNo'] in self.server.fail_once:
+            self.server.fail_once.discard(body['admissionNo'])
+            self.send_response(500)
+            self.end_headers()
+            return
+        if not self.server.released:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = json.dumps({"studentInfo": {"FullName": body['firstName']}, "results": []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def with_fake_server(test):
+    server = FakeResultsServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved_pool = upstream._pool
+    upstream._pool = UpstreamPool([f"http://127.0.0.1:{server.server_address[1]}/api"])
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            test(server, os.path.join(directory, 'warmup.json'))
+    finally:
+        upstream._pool = saved_pool
+        server.shutdown()
+        server.server_close()
+
+def test_load_cohort():
+    """Headers, comments, blank rows and duplicate students are skipped"""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+        f.write("admission_no,first_name\n# school A\n1001,Abebe\n\n1002, Almaz\n1001,abebe\n1003\n")
+    try:
+        assert load_cohort(f.name) == [('1001', 'Abebe'), ('1002', 'Almaz')]
+    finally:
+        os.unlink(f.name)
+
+def test_waits_for_release_then_warms():
+    """Nothing is warmed until the server answers, then every student is cached once"""
+    def test(server, state_path):
+        students = [(str(n), f"student{n}") for n in range(6)]
+        cache = ResultCache()
+        job = WarmupJob(students, cache=cache, state_path=state_path, rate=200, workers=2, poll_interval=0.05)
+        thread = job.start()
+        time.sleep(0.3)
+        assert read_progress(state_path)['state'] == 'waiting'
+        assert all(cache.get_json(cache_key(*s)) is None for s in students)
+
+        server.released = True
+        thread.join(5)
+        assert not thread.is_alive()
+        assert all(cache.get_json(cache_key(*s)) is not None for s in students)
+        progress = read_progress(state_path)
+        assert (progress['state'], progress['total'], progress['done'], progress['failed']) == ('finished', 6, 6, 0)
+
+        # A restarted job skips students that are still cached
+        calls = len(server.calls)
+        WarmupJob(students, cache=cache, state_path=state_path, rate=200).run()
+        assert len(server.calls) == calls
+
+        # but fetches them again when the cache was lost, whatever the saved progress says
+        empty = ResultCache()
+        progress = WarmupJob(students, cache=empty, state_path=state_path, rate=200).run()
+        assert len(server.calls) == calls + len(students)
+        assert all(empty.get_json(cache_key(*s)) is not None for s in students)
+        assert progress['done'] == 6
+
+    with_fake_server(test)
+
+def test_pause_and_resume():
+    """A paused warm-up makes no requests until it is resumed"""
+    def test(server, state_path):
+        server.released = True
+        students = [(str(n), f"student{n}") for n in range(4)]
+        set_paused(True, state_path)
+        assert is_paused(state_path)
+        job = WarmupJob(students, cache=ResultCache(), state_path=state_path, rate=200, poll_interval=0.05)
+        thread = job.start()
+        time.sleep(0.3)
+        assert server.calls == []
+
+        set_paused(False, state_path)
+        thread.join(5)
+        assert not thread.is_alive()
+        assert sorted(server.calls) == ['0', '1', '2', '3']
+
+    with_fake_server(test)
+
+def test_every_attempt_paced():
+    """Retries wait for the pacer too, not only the first request for each student"""
+    def test(server, state_path):
+        server.released = True
+        server.fail_once = {'1'}
+        job = WarmupJob([('0', 'Abebe'), ('1', 'Almaz')], cache=ResultCache(), state_path=state_path, rate=200)
+        waits = []
+        pace = job.pacer.wait
+        job.pacer.wait = lambda: waits.append(pace())
+        assert job.run()['done'] == 2
+        # The release probe warms student 0, then student 1 takes two attempts
+        assert server.calls == ['0', '1', '1'] and len(waits) == 3
+
+    with_fake_server(test)
+
+if __name__ == '__main__':
+    test_load_cohort()
+    test_waits_for_release_then_warms()
+    test_pause_and_resume()
+    test_every_attempt_paced()
+    print("✅ All warm-up tests passed!")
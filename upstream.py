@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Upstream endpoint selection for the Grade 12 Results Bot
+Tracks latency and errors of every configured results API endpoint, sends
+each request to the healthiest one and ejects endpoints that keep failing
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.eaes.et/api/v1/results/web"
+
+# Comma-separated list of equivalent endpoints (mirrors, regional hosts)
+API_URLS = [u.strip() for u in os.environ.get('API_URLS', DEFAULT_API_URL).split(',') if u.strip()]
+
+# Give up connecting quickly so a dead host fails over instead of eating the whole timeout
+CONNECT_TIMEOUT = float(os.environ.get('API_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('API_READ_TIMEOUT', 30))
+# A failure weighs half as much after this many seconds, so one blip does not sideline a fast endpoint
+ERROR_HALF_LIFE = float(os.environ.get('API_ERROR_HALF_LIFE', 30))
+
+def failure_reason(status_code: int) -> str:
+    """Classify a non-200 answer for the lookup event log"""
+    if status_code == 404:
+        return 'not_found'
+    if status_code == 429:
+        return 'rate_limited'
+    if status_code >= 500:
+        return 'server_error'
+    # Other answers (400, 401, 403...) say nothing about the student, so they are retried
+    return 'error'
+
+class Endpoint:
+    def __init__(self, url: str, error_half_life: float = ERROR_HALF_LIFE):
+        self.url = url
+        self.latency: Optional[float] = None  # EWMA of answered requests' response time in seconds
+        self.error_rate = 0.0                 # EWMA of failures, 0..1, as of error_at
+        self.error_at = 0.0
+        self.error_half_life = error_half_life
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.last_error: Optional[str] = None
+
+    def current_error_rate(self, now: float) -> float:
+        """The error rate decayed for the time since it was last updated"""
+        if not self.error_rate or self.error_half_life <= 0:
+            return self.error_rate
+        return self.error_rate * 0.5 ** (max(0.0, now - self.error_at) / self.error_half_life)
+
+    def score(self, now: Optional[float] = None) -> float:
+        """Expected cost of sending a request here, lower is better"""
+        # Endpoints we know nothing about get tried first
+        if self.requests == 0:
+            return 0.0
+        # One that has only failed is assumed as slow as a connect timeout, the least it cost us
+        latency = self.latency if self.latency is not None else CONNECT_TIMEOUT
+        return latency * (1 + 10 * self.current_error_rate(time.time() if now is None else now))
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'error_rate': round(self.current_error_rate(now), 3),
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejected': self.ejected_until > now,
+            'ejected_for_s': round(max(0.0, self.ejected_until - now), 1),
+            'last_error': self.last_error,
+        }
+
+class UpstreamPool:
+    def __init__(self, urls: List[str], alpha: float = 0.3, eject_after: int = 3,
+                 eject_seconds: float = 15, max_eject_seconds: float = 300,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+                 error_half_life: float = ERROR_HALF_LIFE):
+        if not urls:
+            raise ValueError("At least one upstream URL is required")
+        self.endpoints = [Endpoint(url, error_half_life) for url in urls]
+        self.alpha = alpha
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def select(self) -> Endpoint:
+        """Pick the endpoint for the next request"""
+        now = time.time()
+        with self._lock:
+            # An ejected endpoint whose timeout ran out gets a single probe request
+            for endpoint in self.endpoints:
+                if endpoint.ejected_until and endpoint.ejected_until <= now and not endpoint.probing:
+                    endpoint.probing = True
+                    return endpoint
+
+            healthy = [e for e in self.endpoints if e.ejected_until <= now and not e.probing]
+            if not healthy:
+                # Everything is down: use whatever comes back soonest rather than failing outright
+                return min(self.endpoints, key=lambda e: e.ejected_until)
+
+            scores = {e.url: e.score(now) for e in healthy}
+            best = min(scores.values())
+            # Break ties randomly so equal endpoints share the load
+            return random.choice([e for e in healthy if scores[e.url] == best])
+
+    def record_success(self, endpoint: Endpoint, latency: float) -> None:
+        """Record a request the endpoint answered"""
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.latency = latency if endpoint.latency is None else (
+                self.alpha * latency + (1 - self.alpha) * endpoint.latency
+            )
+            now = time.time()
+            endpoint.error_rate = endpoint.current_error_rate(now) * (1 - self.alpha)
+            endpoint.error_at = now
+            endpoint.consecutive_failures = 0
+            if endpoint.ejected_until:
+                logger.info(f"Upstream {endpoint.url} recovered")
+            endpoint.ejected_until = 0.0
+            endpoint.ejections = 0
+            endpoint.probing = False
+
+    def record_failure(self, endpoint: Endpoint, latency: float, reason: str) -> None:
+        """Record a timeout, connection error or overload response"""
+        # The latency of a failure says how long it took to give up, not how fast the
+        # endpoint answers, so it only counts through the error rate
+        with self._lock:
+            now = time.time()
+            endpoint.requests += 1
+            endpoint.failures += 1
+            endpoint.last_error = reason
+            endpoint.error_rate = self.alpha + (1 - self.alpha) * endpoint.current_error_rate(now)
+            endpoint.error_at = now
+            endpoint.consecutive_failures += 1
+
+            if endpoint.probing or endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejections += 1
+                duration = min(self.eject_seconds * 2 ** (endpoint.ejections - 1), self.max_eject_seconds)
+                endpoint.ejected_until = now + duration
+                logger.warning(f"Ejecting upstream {endpoint.url} for {duration:.0f}s ({reason})")
+            endpoint.probing = False
+
+    def post(self, **kwargs) -> requests.Response:
+        """POST to the healthiest endpoint and record how it went"""
+        endpoint = self.select()
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.monotonic()
+        try:
+            response = requests.post(endpoint.url, **kwargs)
+        except requests.exceptions.Timeout:
+            self.record_failure(endpoint, time.monotonic() - started, "timeout")
+            raise
+        except requests.exceptions.ConnectionError:
+            self.record_failure(endpoint, time.monotonic() - started, "connection error")
+            raise
+        except Exception as e:
+            self.record_failure(endpoint, time.monotonic() - started, type(e).__name__)
+            raise
+
+        self.record_response(endpoint, response.status_code, time.monotonic() - started)
+        return response
+
+    def record_response(self, endpoint: Endpoint, status_code: int, latency: float) -> None:
+        """Record an HTTP answer from the endpoint"""
+        # 429 and 5xx mean the endpoint is struggling, anything else is an answer
+        if status_code == 429 or status_code >= 500:
+            self.record_failure(endpoint, latency, f"HTTP {status_code}")
+        else:
+            self.record_success(endpoint, latency)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint health"""
+        now = time.time()
+        with self._lock:
+            return [endpoint.stats(now) for endpoint in self.endpoints]
+
+_pool: Optional[UpstreamPool] = None
+_pool_lock = threading.Lock()
+
+def get_upstream_pool() -> UpstreamPool:
+    """Return the process-wide pool built from API_URLS"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = UpstreamPool(API_URLS)
+        return _pool
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Warm state handoff for the Grade 12 Results Bot
+Saves the hottest cached results and uploaded Telegram media ids on shutdown
+so the next process starts with warm caches
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+from typing import Dict
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# Must be on a persistent volume: a deploy starts a fresh container, whose temp directory is empty
+SNAPSHOT_PATH = os.environ.get(
+    'STATE_SNAPSHOT_PATH',
+    os.path.join(tempfile.gettempdir(), 'grade12_state.json')
+)
+# Keep the snapshot small enough to write well inside the shutdown deadline
+SNAPSHOT_MAX_RESULTS = int(os.environ.get('STATE_SNAPSHOT_RESULTS', 5000))
+
+def save_snapshot(cache: ResultCache, media_ids: Dict[str, str], path: str = SNAPSHOT_PATH,
+                  max_results: int = SNAPSHOT_MAX_RESULTS) -> int:
+    """Write the hottest cache entries and media ids to disk, returns the number of results saved"""
+    results = cache.items()[-max_results:] if max_results > 0 else []
+    snapshot = {
+        'saved_at': time.time(),
+        'results': results,
+        'media_ids': media_ids,
+    }
+
+    # Write to a temporary file first so a crash never leaves a half-written snapshot
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.grade12_state.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Saved {len(results)} cached results and {len(media_ids)} media ids to {path}")
+    return len(results)
+
+def load_snapshot(cache: ResultCache, path: str = SNAPSHOT_PATH) -> Dict[str, str]:
+    """Restore cached results from a snapshot, returns the saved media ids"""
+    if path == SNAPSHOT_PATH and not os.environ.get('STATE_SNAPSHOT_PATH'):
+        logger.warning(f"STATE_SNAPSHOT_PATH is not set, so the warm state is kept in {path}, "
+                       "which a new container will not have; point it at a persistent volume")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read state snapshot {path}: {e}")
+        return {}
+
+    now = time.time()
+    restored = 0
+    for key, expires, body in snapshot.get('results', []):
+        if expires > now:
+            cache.put_json(key, body, ttl=expires - now)
+            restored += 1
+
+    media_ids = snapshot.get('media_ids') or {}
+    logger.info(f"Restored {restored} cached results and {len(media_ids)} media ids from {path}")
+    return media_ids
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Pre-release cache warm-up for registered cohorts
+Waits until the results server starts answering, then fetches every student
+on a school's registered list at a controlled rate, so release-day lookups
+are served from the result cache instead of all hitting the upstream at once
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+from get_grade_12_result import make_request_with_retry
+from result_cache import ResultCache, get_result_cache, cache_key, SHARED_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# A registered cohort the server warms in the background as soon as results are published
+WARMUP_COHORT = os.environ.get('WARMUP_COHORT')
+WARMUP_STATE_PATH = os.environ.get(
+    'WARMUP_STATE_PATH',
+    os.path.join(tempfile.gettempdir(), 'grade12_warmup.json')
+)
+WARMUP_RATE = float(os.environ.get('WARMUP_RATE', 1))
+WARMUP_POLL = float(os.environ.get('WARMUP_POLL', 60))
+# Warmed results are fetched before anyone asks for them, so keep them through release day
+WARMUP_TTL = int(os.environ.get('WARMUP_TTL', 24 * 3600))
+
+def load_cohort(path: str) -> List[Tuple[str, str]]:
+    """Read 'admission number, first name' rows, skipping blanks, comments, a header and duplicates"""
+    students = []
+    seen = set()
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip() or row[0].lstrip().startswith('#'):
+                continue
+            admission_no, first_name = row[0].strip(), row[1].strip()
+            if admission_no.lower().replace('_', '').replace(' ', '') in ('admissionno', 'admission'):
+                continue
+            key = cache_key(admission_no, first_name)
+            if first_name and key not in seen:
+                seen.add(key)
+                students.append((admission_no, first_name))
+    return students
+
+def pause_path(state_path: str) -> str:
+    return state_path + '.pause'
+
+def is_paused(state_path: str = WARMUP_STATE_PATH) -> bool:
+    return os.path.exists(pause_path(state_path))
+
+def set_paused(paused: bool, state_path: str = WARMUP_STATE_PATH) -> None:
+    """Pause or resume a warm-up, whichever process is running it"""
+    if paused:
+        with open(pause_path(state_path), 'w'):
+            pass
+    elif is_paused(state_path):
+        os.unlink(pause_path(state_path))
+
+class WarmupProgress:
+    def __init__(self, path: str = WARMUP_STATE_PATH):
+        """Progress of a warm-up, saved to disk so a restarted job picks up where it stopped"""
+        self.path = path
+        self.total = 0
+        self.done: set = set()
+        self.failed: Dict[str, str] = {}
+        self.state = 'idle'
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read warm-up progress {self.path}: {e}")
+            return
+        self.done = set(saved.get('done', []))
+        self.failed = dict(saved.get('failed', {}))
+
+    def mark(self, key: str, status: str) -> None:
+        with self._lock:
+            if status == 'found':
+                self.done.add(key)
+                self.failed.pop(key, None)
+            else:
+                self.failed[key] = status
+
+    def forget(self, key: str) -> None:
+        """Count a student as not warmed, e.g. when their result has left the cache"""
+        with self._lock:
+            self.done.discard(key)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            done, failed = len(self.done), len(self.failed)
+        summary = {'state': self.state, 'total': self.total, 'done': done, 'failed': failed}
+        if self.started_at:
+            summary['elapsed'] = round(time.time() - self.started_at, 1)
+        return summary
+
+    def save(self) -> None:
+        """Write the progress atomically"""
+        with self._lock:
+            saved = {
+                'state': self.state,
+                'total': self.total,
+                'started_at': self.started_at,
+                'saved_at': time.time(),
+                'done': sorted(self.done),
+                'failed': dict(self.failed),
+            }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.grade12_warmup.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(saved, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+def read_progress(path: str = WARMUP_STATE_PATH) -> Optional[Dict[str, Any]]:
+    """Progress counts of the last or running warm-up, or None if there has not been one"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {
+        'state': 'paused' if is_paused(path) and saved.get('state') == 'running' else saved.get('state'),
+        'total': saved.get('total', 0),
+        'done': len(saved.get('done', [])),
+        'failed': len(saved.get('failed', {})),
+        'saved_at': saved.get('saved_at'),
+    }
+
+class Pacer:
+    def __init__(self, rate: float):
+        """Space requests out to `rate` per second across every thread"""
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class WarmupJob:
+    def __init__(self, students: List[Tuple[str, str]], cache: Optional[ResultCache] = None,
+                 state_path: str = WARMUP_STATE_PATH, rate: float = WARMUP_RATE, workers: int = 2,
+                 poll_interval: float = WARMUP_POLL, max_retries: int = 3, ttl: float = WARMUP_TTL):
+        self.students = students
+        self.cache = cache if cache is not None else get_result_cache()
+        self.state_path = state_path
+        self.progress = WarmupProgress(state_path)
+        self.progress.total = len(students)
+        self.pacer = Pacer(rate)
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        self.ttl = ttl
+        self.stop_event = threading.Event()
+        self._next = 0
+        self._next_lock = threading.Lock()
+
+    def pending(self) -> List[Tuple[str, str]]:
+        """Students whose results are not in the cache
+
+        The saved progress is only a report: after a restart without a snapshot, or once
+        entries expire, students it lists as done have to be fetched again.
+        """
+        pending = []
+        for student in self.students:
+            key = cache_key(*student)
+            if self.cache.get_json(key) is not None:
+                self.progress.mark(key, 'found')
+            else:
+                self.progress.forget(key)
+                pending.append(student)
+        return pending
+
+    def fetch(self, admission_no: str, first_name: str, max_retries: int) -> bool:
+        """Fetch one student into the cache, returns whether a result was stored"""
+        key = cache_key(admission_no, first_name)
+        if self.cache.get_json(key) is not None:
+            self.progress.mark(key, 'found')
+            return True
+        trace: Dict[str, Any] = {}
+        # Every attempt is paced, retries included, so failures cannot push the rate past WARMUP_RATE
+        data = make_request_with_retry(admission_no, first_name, max_retries, trace, verbose=False,
+                                       before_attempt=self.pacer.wait)
+        if data:
+            self.cache.put(key, data, ttl=self.ttl)
+        self.progress.mark(key, trace.get('status', 'error'))
+        return bool(data)
+
+    def wait_for_release(self, students: List[Tuple[str, str]]) -> bool:
+        """Probe students until the results server answers, returns False if stopped first"""
+        self.progress.state = 'waiting'
+        self.progress.save()
+        # Rotate the probe so one mistyped registration cannot hold the warm-up back forever
+        probes = students[:5]
+        attempt = 0
+        while not self.stop_event.is_set():
+            if not is_paused(self.state_path):
+                if self.fetch(*probes[attempt % len(probes)], max_retries=1):
+                    logger.info("Results server is answering, starting warm-up")
+                    return True
+                attempt += 1
+            self.stop_event.wait(self.poll_interval)
+        return False
+
+    def next_student(self, students: List[Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+        with self._next_lock:
+            if self._next >= len(students):
+                return None
+            self._next += 1
+            return students[self._next - 1]
+
+    def worker(self, students: List[Tuple[str, str]]) -> None:
+        while not self.stop_event.is_set():
+            while is_paused(self.state_path) and not self.stop_event.is_set():
+                self.stop_event.wait(1)
+            student = self.next_student(students)
+            if student is None or self.stop_event.is_set():
+                return
+            try:
+                self.fetch(*student, max_retries=self.max_retries)
+            except Exception as e:
+                logger.error(f"Warm-up fetch failed: {e}")
+                self.progress.mark(cache_key(*student), 'error')
+
+    def run(self, report_interval: float = 10) -> Dict[str, Any]:
+        """Wait for the release, warm every pending student, and return the final progress"""
+        students = self.pending()
+        self.progress.started_at = time.time()
+        if students and self.wait_for_release(students):
+            self.progress.state = 'running'
+            self.progress.save()
+            students = self.pending()
+            threads = [threading.Thread(target=self.worker, args=(students,), name=f"warmup-{n}", daemon=True)
+                       for n in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            while True:
+                alive = [thread for thread in threads if thread.is_alive()]
+                if not alive:
+                    break
+                alive[0].join(timeout=report_interval)
+                self.progress.save()
+                logger.info(f"Warm-up progress: {self.progress.summary()}")
+
+        self.progress.state = 'stopped' if self.stop_event.is_set() else 'finished'
+        self.progress.save()
+        return self.progress.summary()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def start(self) -> threading.Thread:
+        """Run the job in a background thread"""
+        thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+def start_warmup() -> Optional[WarmupJob]:
+    """Start warming the cache for WARMUP_COHORT in the background, if it is set"""
+    if not WARMUP_COHORT:
+        return None
+    try:
+        students = load_cohort(WARMUP_COHORT)
+    except OSError as e:
+        logger.error(f"Could not read warm-up cohort {WARMUP_COHORT}: {e}")
+        return None
+    logger.info(f"Warming {len(students)} students from {WARMUP_COHORT} once results are published")
+    job = WarmupJob(students)
+    job.start()
+    return job
+
+def main():
+    """Run, pause, resume or inspect a warm-up"""
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Warm the result cache for a registered cohort")
+    parser.add_argument('command', choices=('run', 'pause', 'resume', 'status'))
+    parser.add_argument('cohort', nargs='?', help="CSV of admission number, first name (for run)")
+    parser.add_argument('--state', default=WARMUP_STATE_PATH, help="progress file")
+    parser.add_argument('--rate', type=float, default=WARMUP_RATE, help="requests per second to the results server")
+    parser.add_argument('--workers', type=int, default=2, help="lookups running at the same time")
+    parser.add_argument('--poll', type=float, default=WARMUP_POLL, help="seconds between release checks")
+    args = parser.parse_args()
+
+    if args.command in ('pause', 'resume'):
+        set_paused(args.command == 'pause', args.state)
+        print(f"Warm-up {'paused' if args.command == 'pause' else 'resumed'}.")
+        return
+    if args.command == 'status':
+        print(json.dumps(read_progress(args.state) or {'state': 'none'}, indent=2))
+        return
+    if not args.cohort:
+        parser.error("run needs a cohort file")
+
+    # Other processes only see warmed results through the shared cache file
+    cache = ResultCache(os.environ.get('RESULT_CACHE_PATH') or SHARED_CACHE_PATH)
+    job = WarmupJob(load_cohort(args.cohort), cache=cache, state_path=args.state, rate=args.rate,
+                    workers=args.workers, poll_interval=args.poll)
+    signal.signal(signal.SIGINT, lambda *_: job.stop())
+    signal.signal(signal.SIGTERM, lambda *_: job.stop())
+    summary = job.run()
+    cache.close()
+    print(json.dumps(summary, indent=2))
+    sys.exit(0 if summary['state'] == 'finished' else 1)
+
+if __name__ == '__main__':
+    main()